@@ -24,7 +24,11 @@ Key features:
         'views/shopify_connector_views.xml',
         'views/sale_order_views.xml',
         'views/menu_views.xml',
+        'views/shopify_product_map_views.xml',
+        'views/shopify_webhook_event_views.xml',
+        'views/shopify_sync_run_views.xml',
         'data/cron_jobs.xml',
+        'data/sale_order_data.xml',
         'data/demo_data.xml',
         'wizard/shopify_config_wizard_views.xml',
     ],
@@ -1,119 +1,118 @@
 from odoo import http
 from odoo.http import request
-import json
+from odoo.tools import config
+import hmac
 import logging
+import time
+
+from ..models.shopify_webhook_event import SUPPORTED_TOPICS
+from ..tools import metrics
 
 _logger = logging.getLogger(__name__)
 
 
 class BitzifyShopifyController(http.Controller):
 
-    @http.route('/bitzify/shopify/webhook', type='json', auth='public', csrf=False, methods=['POST'])
+    @http.route('/bitzify/shopify/webhook', type='http', auth='public', csrf=False, methods=['POST'])
     def shopify_webhook(self, **kwargs):
-        """Endpoint to receive Shopify webhooks"""
+        """Endpoint to receive Shopify webhooks
+
+        Deliveries are only verified and queued here, then processed by the
+        webhook queue cron, so Shopify gets its answer right away.
+        """
+        headers = request.httprequest.headers
+        topic = headers.get('X-Shopify-Topic')
+        shop = (
+            request.env['bitzify.shopify.connector']._normalize_shop_domain(headers.get('X-Shopify-Shop-Domain'))
+            or 'unknown'
+        )
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            status, response = self._handle_webhook(headers, topic, shop)
+            return response
+        finally:
+            # Headers are untrusted, only label with values matching a connector
+            verified = status in ('queued', 'duplicate', 'ignored')
+            shop_label = shop if verified or status == 'invalid_signature' else 'unknown'
+            metrics.WEBHOOKS_RECEIVED.inc(shop=shop_label, topic=topic if verified else '', status=status)
+            metrics.WEBHOOK_DURATION.observe(time.perf_counter() - start, shop=shop_label)
+
+    def _handle_webhook(self, headers, topic, shop_domain):
+        """Verify and queue a webhook delivery, returning its outcome and response"""
         try:
             _logger.info('Bitzify Shopify webhook received')
             
             # Get webhook headers
-            headers = request.httprequest.headers
             hmac_header = headers.get('X-Shopify-Hmac-Sha256')
-            topic = headers.get('X-Shopify-Topic')
-            shop_domain = headers.get('X-Shopify-Shop-Domain')
             
             if not hmac_header:
                 _logger.warning('Missing HMAC header in webhook')
-                return {'error': 'Missing HMAC header'}
+                return 'invalid', request.make_json_response({'error': 'Missing HMAC header'})
                 
             if not topic:
                 _logger.warning('Missing topic header in webhook')
-                return {'error': 'Missing topic header'}
+                return 'invalid', request.make_json_response({'error': 'Missing topic header'})
                 
-            # Find the connector for this shop
-            connector = request.env['bitzify.shopify.connector'].sudo().search([
-                ('shopify_store_url', '=', shop_domain),
-                ('is_active', '=', True)
-            ], limit=1)
+            # Find the connector for this shop (cached per worker)
+            Connector = request.env['bitzify.shopify.connector'].sudo()
+            connector_id, webhook_secret = Connector._get_webhook_credentials(shop_domain)
             
-            if not connector:
+            if not connector_id:
                 _logger.error(f'No active connector found for shop {shop_domain}')
-                return {'error': 'Connector not found'}
+                return 'unknown_shop', request.make_json_response({'error': 'Connector not found'})
+            connector = Connector.browse(connector_id)
                 
-            # Get webhook data
-            webhook_data = request.jsonrequest
-            
             # Verify webhook signature if secret is configured
-            if connector.webhook_secret:
-                raw_data = request.httprequest.get_data()
-                if not connector.verify_webhook(raw_data, hmac_header):
+            raw_data = request.httprequest.get_data()
+            if webhook_secret:
+                with metrics.HMAC_DURATION.time(shop=shop_domain):
+                    verified = Connector._verify_webhook_signature(webhook_secret, raw_data, hmac_header)
+                if not verified:
                     _logger.error('Webhook signature verification failed')
-                    return {'error': 'Invalid signature'}
+                    return 'invalid_signature', request.make_json_response({'error': 'Invalid signature'})
                     
-            # Process webhook based on topic
-            if topic in ['orders/create', 'orders/updated', 'orders/paid']:
-                return self._process_order_webhook(connector, webhook_data, topic)
-            elif topic == 'orders/cancelled':
-                return self._process_order_cancellation(connector, webhook_data)
-            else:
+            if topic not in SUPPORTED_TOPICS:
                 _logger.info(f'Ignoring webhook topic: {topic}')
-                return {'status': 'ignored', 'topic': topic}
+                return 'ignored', request.make_json_response({'status': 'ignored', 'topic': topic})
+                
+            # Queue the delivery, it is processed asynchronously
+            webhook_id = headers.get('X-Shopify-Webhook-Id')
+            event = request.env['bitzify.shopify.webhook.event'].sudo()._enqueue(
+                connector, topic, raw_data.decode('utf-8'), webhook_id=webhook_id
+            )
+            if not event:
+                _logger.info(f'Ignoring duplicate webhook delivery {webhook_id}')
+                return 'duplicate', request.make_json_response({'status': 'duplicate', 'topic': topic})
+                
+            return 'queued', request.make_json_response({
+                'status': 'queued',
+                'topic': topic,
+                'event_id': event.id
+            })
                 
         except Exception as e:
             _logger.error(f'Error processing Shopify webhook: {e}', exc_info=True)
-            return {'error': 'Internal server error'}
+            # Let Shopify deliver again later
+            return 'error', request.make_json_response({'error': 'Internal server error'}, status=500)
 
-    def _process_order_webhook(self, connector, order_data, topic):
-        """Process order-related webhooks"""
-        try:
-            order = connector.sudo()._process_shopify_order(order_data)
-            
-            return {
-                'status': 'success',
-                'topic': topic,
-                'order_id': order.id,
-                'order_name': order.name
-            }
-            
-        except Exception as e:
-            _logger.error(f'Error processing order webhook: {e}', exc_info=True)
-            return {'error': f'Error processing order: {str(e)}'}
+    @http.route('/bitzify/shopify/metrics', type='http', auth='none', csrf=False, methods=['GET'])
+    def metrics(self):
+        """Expose the connector metrics of the server in Prometheus text format
 
-    def _process_order_cancellation(self, connector, order_data):
-        """Process order cancellation webhook"""
-        try:
-            shopify_order_id = str(order_data.get('id'))
-            
-            # Find existing order
-            order = request.env['sale.order'].sudo().search([
-                ('shopify_order_id', '=', shopify_order_id)
-            ], limit=1)
+        Requires the ``bitzify_shopify_metrics_token`` server option as a
+        bearer token. The metrics of every worker, cron workers included,
+        are merged from their files; the database is never hit.
+        """
+        token = config.get('bitzify_shopify_metrics_token')
+        authorization = request.httprequest.headers.get('Authorization', '')
+        if not token or not hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+            return request.make_response('Unauthorized', headers=[('WWW-Authenticate', 'Bearer')], status=401)
             
-            if order:
-                # Cancel the order if it's not already done
-                if order.state not in ['done', 'cancel']:
-                    order.action_cancel()
-                    
-                # Update Shopify status  
-                order.write({
-                    'shopify_financial_status': 'voided',
-                    'shopify_fulfillment_status': 'restocked'
-                })
-                
-                return {
-                    'status': 'success',
-                    'topic': 'orders/cancelled',
-                    'order_id': order.id,
-                    'message': 'Order cancelled successfully'
-                }
-            else:
-                return {
-                    'status': 'not_found',
-                    'topic': 'orders/cancelled',
-                    'message': 'Order not found in Odoo'
-                }
-                
-        except Exception as e:
-            _logger.error(f'Error processing order cancellation: {e}', exc_info=True)
-            return {'error': f'Error cancelling order: {str(e)}'}
+        return request.make_response(
+            metrics.render(),
+            headers=[('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')]
+        )
 
     @http.route('/bitzify/shopify/test', type='http', auth='public', csrf=False)
     def test_endpoint(self):
@@ -1,3 +1,6 @@
 from . import shopify_connector
+from . import shopify_product_map
+from . import shopify_webhook_event
+from . import shopify_sync_run
 from . import sale_order
 from . import res_partner
@@ -5,5 +5,12 @@ class ResPartner(models.Model):
     _inherit = 'res.partner'
 
     # Shopify related fields
-    shopify_customer_id = fields.Char('Shopify Customer ID', readonly=True)
+    shopify_customer_id = fields.Char('Shopify Customer ID', readonly=True, index='btree_not_null')
     is_shopify_customer = fields.Boolean('Is Shopify Customer', readonly=True)
+    shopify_address_hash = fields.Char(
+        'Shopify Address Hash',
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        help='Normalized hash of the Shopify address of this delivery contact'
+    )
@@ -1,11 +1,18 @@
-from odoo import models, fields
+from odoo import models, fields, tools
 
 
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
 
     # Shopify related fields
-    shopify_order_id = fields.Char('Shopify Order ID', readonly=True)
+    shopify_order_id = fields.Char('Shopify Order ID', readonly=True, index='btree_not_null')
+    shopify_connector_id = fields.Many2one(
+        'bitzify.shopify.connector',
+        'Shopify Connector',
+        readonly=True,
+        ondelete='set null',
+        help='Connector that imported this order; indexed through the unique constraint below'
+    )
     shopify_order_number = fields.Char('Shopify Order Number', readonly=True)
     is_shopify_order = fields.Boolean('Is Shopify Order', default=False, readonly=True)
     shopify_financial_status = fields.Selection([
@@ -23,6 +30,49 @@ class SaleOrder(models.Model):
         ('partial', 'Partially Fulfilled'),
         ('restocked', 'Restocked')
     ], string='Shopify Fulfillment Status', readonly=True)
+    shopify_payload_hash = fields.Char(
+        'Shopify Payload Hash',
+        readonly=True,
+        copy=False,
+        help='Fingerprint of the Shopify fields last applied to this order'
+    )
+    shopify_confirmation_error = fields.Text(
+        'Shopify Confirmation Error',
+        readonly=True,
+        copy=False,
+        help='Why the automatic confirmation of this paid Shopify order failed'
+    )
+
+    _sql_constraints = [
+        ('shopify_order_connector_uniq', 'unique(shopify_connector_id, shopify_order_id)',
+         'This Shopify order has already been imported by this connector.'),
+    ]
+
+    def init(self):
+        super().init()
+        # Partial indexes for the Shopify order views, a small slice of all orders
+        tools.create_index(
+            self._cr, 'sale_order_shopify_date_order_idx', self._table,
+            ['date_order DESC', 'id DESC'], where='is_shopify_order'
+        )
+        tools.create_index(
+            self._cr, 'sale_order_shopify_connector_date_order_idx', self._table,
+            ['shopify_connector_id', 'date_order DESC', 'id DESC'], where='is_shopify_order'
+        )
+        tools.create_index(
+            self._cr, 'sale_order_shopify_financial_status_idx', self._table,
+            ['shopify_financial_status'], where='is_shopify_order'
+        )
+        tools.create_index(
+            self._cr, 'sale_order_shopify_fulfillment_status_idx', self._table,
+            ['shopify_fulfillment_status'], where='is_shopify_order'
+        )
+
+    def action_confirm(self):
+        res = super().action_confirm()
+        # Confirmed after all, manually or by a later import
+        self.filtered('shopify_confirmation_error').shopify_confirmation_error = False
+        return res
 
     def _get_shopify_status_badge(self):
         """Get badge color for Shopify status"""
@@ -49,13 +99,14 @@ class SaleOrder(models.Model):
         if not self.shopify_order_id:
             return
             
-        # Find the connector for this order
-        connector = self.env['bitzify.shopify.connector'].search([
+        # Orders imported before connector ownership was recorded fall back
+        # to the first active connector
+        connector = self.shopify_connector_id or self.env['bitzify.shopify.connector'].search([
             ('is_active', '=', True)
         ], limit=1)
         
         if connector:
-            shopify_url = f"https://{connector.shopify_store_url}/admin/orders/{self.shopify_order_id}"
+            shopify_url = f"https://{connector.shopify_shop_domain}/admin/orders/{self.shopify_order_id}"
             return {
                 'type': 'ir.actions.act_url',
                 'url': shopify_url,
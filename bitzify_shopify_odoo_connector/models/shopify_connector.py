@@ -1,4 +1,4 @@
-from odoo import models, fields, api, _
+from odoo import models, fields, api, sql_db, tools, _
 from odoo.exceptions import UserError, ValidationError
 import requests
 import json
@@ -6,10 +6,43 @@ import logging
 import hmac
 import hashlib
 import base64
+import functools
+import psycopg2
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
+from ..tools import metrics, shopify_bulk
+from ..tools.shopify_fields import order_fingerprint, rest_order_fields
+from ..tools.shopify_client import ShopifyClient, ShopifyError, drop_sessions, format_datetime, parse_datetime
+from ..tools.sync_stats import SyncStats
+
 _logger = logging.getLogger(__name__)
 
+# Default number of orders handled, then committed, together
+ORDER_BATCH_SIZE = 50
+
+# Scheduled imports running at the same time across all connectors
+DEFAULT_MAX_PARALLEL_IMPORTS = 4
+# Advisory lock namespaces: one lock per connector, one per parallel slot
+IMPORT_LOCK_CONNECTOR = 52101
+IMPORT_LOCK_SLOT = 52102
+
+# Seconds the connector statistics are cached for, per worker
+STATS_CACHE_TTL = 60
+# (database, statistic) -> (expiry, values)
+_stats_cache = {}
+
+# Seconds a worker keeps the webhook credentials of the active connectors;
+# bounds how long other workers accept credentials changed meanwhile
+WEBHOOK_CREDENTIALS_TTL = 60
+# database -> (expiry, {shop domain: (connector id, webhook secret)})
+_webhook_credentials = {}
+
+# Shopify address fields identifying a delivery address
+ADDRESS_HASH_FIELDS = ('name', 'address1', 'address2', 'city', 'zip', 'province_code', 'country_code', 'phone')
+
 
 class ShopifyConnector(models.Model):
     _name = 'bitzify.shopify.connector'
@@ -37,11 +70,74 @@ class ShopifyConnector(models.Model):
         required=True,
         help='Shopify API version (e.g., 2023-10)'
     )
+    shopify_shop_domain = fields.Char(
+        'Shop Domain',
+        compute='_compute_shopify_shop_domain',
+        store=True,
+        index=True,
+        help='Normalized store domain, matched against the X-Shopify-Shop-Domain header of webhooks'
+    )
     is_active = fields.Boolean('Active', default=True)
     
+    # HTTP settings
+    http_connect_timeout = fields.Integer(
+        'Connect Timeout (seconds)',
+        default=10,
+        help='Time allowed to open a connection to Shopify'
+    )
+    http_read_timeout = fields.Integer(
+        'Read Timeout (seconds)',
+        default=30,
+        help='Time allowed for Shopify to answer a request'
+    )
+    http_max_retries = fields.Integer(
+        'Max Retries',
+        default=3,
+        help='Retries on server errors and dropped connections, with jittered backoff'
+    )
+    
     # Order import settings
     auto_import_orders = fields.Boolean('Auto Import Orders', default=True)
     import_interval_minutes = fields.Integer('Import Interval (minutes)', default=30)
+    import_batch_size = fields.Integer(
+        'Import Batch Size',
+        default=ORDER_BATCH_SIZE,
+        help='Orders created together and committed at once during imports. '
+             'Smaller batches hold database locks for less time.'
+    )
+    sync_watermark = fields.Datetime(
+        'Sync Watermark',
+        readonly=True,
+        copy=False,
+        help='Highest Shopify update time among imported orders; '
+             'incremental imports fetch orders updated since then'
+    )
+    sync_overlap_minutes = fields.Integer(
+        'Sync Overlap (minutes)',
+        default=5,
+        help='Incremental imports start this long before the watermark, '
+             'to catch orders whose update was committed late in Shopify'
+    )
+    import_checkpoint_cursor = fields.Char(
+        'Import Checkpoint Cursor',
+        readonly=True,
+        copy=False,
+        help='Cursor of the next page to fetch when resuming an interrupted import'
+    )
+    import_checkpoint_updated_at = fields.Datetime(
+        'Import Checkpoint',
+        readonly=True,
+        copy=False,
+        help='Highest order update time committed by an interrupted import'
+    )
+    import_cron_id = fields.Many2one(
+        'ir.cron',
+        'Scheduled Import',
+        readonly=True,
+        copy=False,
+        ondelete='set null',
+        help='Scheduled action importing the orders of this connector'
+    )
     last_order_import = fields.Datetime('Last Order Import')
     import_from_date = fields.Datetime(
         'Import Orders From Date',
@@ -57,14 +153,82 @@ class ShopifyConnector(models.Model):
         help='Product to use when Shopify product is not found in Odoo'
     )
     
-    # Statistics
-    total_orders_imported = fields.Integer('Total Orders Imported', readonly=True)
+    # Bulk backfill
+    bulk_operation_id = fields.Char('Bulk Operation', readonly=True, copy=False)
+    bulk_operation_status = fields.Char('Bulk Operation Status', readonly=True, copy=False)
+    
+    # Statistics, aggregated from the imported orders and the sync runs
+    # instead of being written on the connector by every import
+    total_orders_imported = fields.Integer('Total Orders Imported', compute='_compute_sync_statistics')
     last_sync_status = fields.Selection([
         ('success', 'Success'),
         ('error', 'Error'),
         ('pending', 'Pending')
-    ], string='Last Sync Status', readonly=True)
-    last_sync_message = fields.Text('Last Sync Message', readonly=True)
+    ], string='Last Sync Status', compute='_compute_sync_statistics')
+    last_sync_message = fields.Text('Last Sync Message', compute='_compute_sync_statistics')
+
+    def _compute_sync_statistics(self):
+        order_counts = self._get_cached_statistic('order_counts', self._read_order_counts)
+        last_runs = self._get_cached_statistic('last_runs', self._read_last_runs)
+        for connector in self:
+            connector.total_orders_imported = order_counts.get(connector.id, 0)
+            state, message, imported_count, failed_count = last_runs.get(connector.id, (False, False, 0, 0))
+            if state == 'done':
+                connector.last_sync_status = 'success'
+                connector.last_sync_message = _('Successfully imported %s orders') % imported_count
+                if failed_count:
+                    connector.last_sync_message += _(', %s failed') % failed_count
+            else:
+                connector.last_sync_status = state
+                connector.last_sync_message = message
+
+    def _get_cached_statistic(self, name, read):
+        """Return the value of a statistic of all connectors, read at most once per TTL"""
+        key = (self.env.cr.dbname, name)
+        now = time.monotonic()
+        cached = _stats_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+        values = read()
+        _stats_cache[key] = (now + STATS_CACHE_TTL, values)
+        return values
+
+    @api.model
+    def _clear_statistics_cache(self):
+        for key in [key for key in _stats_cache if key[0] == self.env.cr.dbname]:
+            _stats_cache.pop(key, None)
+
+    @api.model
+    def _read_order_counts(self):
+        """Count the orders imported by each connector"""
+        groups = self.env['sale.order'].sudo()._read_group(
+            [('is_shopify_order', '=', True), ('shopify_connector_id', '!=', False)],
+            ['shopify_connector_id'],
+            ['__count'],
+        )
+        return {connector.id: count for connector, count in groups}
+
+    @api.model
+    def _read_last_runs(self):
+        """Return the outcome of the latest import run of each connector
+
+        Each connector reads its latest run from the top of the partial
+        last-run index, the runs history is never sorted.
+        """
+        self.env['bitzify.shopify.sync.run'].flush_model()
+        # Webhook runs only process pushed orders, they are not imports
+        self.env.cr.execute("""
+            SELECT connector.id, run.state, run.message, run.orders_created + run.orders_updated, run.orders_failed
+            FROM bitzify_shopify_connector connector
+            CROSS JOIN LATERAL (
+                SELECT state, message, orders_created, orders_updated, orders_failed
+                FROM bitzify_shopify_sync_run
+                WHERE connector_id = connector.id AND trigger != 'webhook'
+                ORDER BY date_start DESC, id DESC
+                LIMIT 1
+            ) run
+        """)
+        return {row[0]: row[1:] for row in self.env.cr.fetchall()}
 
     @api.constrains('shopify_store_url')
     def _check_store_url(self):
@@ -74,18 +238,98 @@ class ShopifyConnector(models.Model):
                 if not url.endswith('.myshopify.com'):
                     if not '.' in url:
                         record.shopify_store_url = f"{url}.myshopify.com"
+                        
+    @api.depends('shopify_store_url')
+    def _compute_shopify_shop_domain(self):
+        for record in self:
+            record.shopify_shop_domain = self._normalize_shop_domain(record.shopify_store_url)
+
+    @api.model
+    def _normalize_shop_domain(self, url):
+        """Normalize a store URL or shop domain for comparison"""
+        if not url:
+            return False
+        domain = url.strip().lower().split('://', 1)[-1]
+        return domain.split('/', 1)[0]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._sync_import_cron()
+        self._clear_webhook_cache()
+        return records
+
+    def write(self, vals):
+        if {'shopify_store_url', 'api_access_token', 'http_max_retries'} & set(vals):
+            for record in self:
+                drop_sessions(record.shopify_store_url)
+        res = super().write(vals)
+        if {'name', 'is_active', 'auto_import_orders', 'import_interval_minutes'} & set(vals):
+            self._sync_import_cron()
+        if {'is_active', 'auto_import_orders'} & set(vals):
+            # Without its cron, a running export would never be imported
+            self.filtered(
+                lambda record: record.bulk_operation_id and not (record.is_active and record.auto_import_orders)
+            ).write({'bulk_operation_id': False})
+        if {'shopify_store_url', 'webhook_secret', 'is_active'} & set(vals):
+            self._clear_webhook_cache()
+        return res
+
+    def unlink(self):
+        crons = self.import_cron_id
+        res = super().unlink()
+        crons.sudo().unlink()
+        self._clear_webhook_cache()
+        return res
+
+    def _sync_import_cron(self):
+        """Create or update the scheduled action importing each connector
+
+        Every connector runs in its own cron, hence its own transaction and
+        worker, at its own interval.
+        """
+        model_id = self.env['ir.model']._get_id(self._name)
+        for record in self:
+            cron_vals = {
+                'name': f'Bitzify: Import Shopify Orders ({record.name})',
+                'interval_number': max(record.import_interval_minutes, 1),
+                'interval_type': 'minutes',
+                'active': record.is_active and record.auto_import_orders,
+            }
+            if record.import_cron_id:
+                record.import_cron_id.sudo().write(cron_vals)
+            else:
+                cron_vals.update({
+                    'model_id': model_id,
+                    'state': 'code',
+                    'code': f'model._cron_import_connector({record.id})',
+                    'numbercall': -1,
+                    'user_id': self.env.ref('base.user_root').id,
+                })
+                record.import_cron_id = self.env['ir.cron'].sudo().create(cron_vals)
+
+    @api.model
+    def _sync_import_crons(self):
+        """Create or update the scheduled import of every connector"""
+        self.search([])._sync_import_cron()
+
+    def _get_shopify_client(self):
+        """Return a client using the pooled HTTP session of this store"""
+        self.ensure_one()
+        return ShopifyClient(
+            self.shopify_store_url,
+            self.api_access_token,
+            self.api_version,
+            connect_timeout=self.http_connect_timeout,
+            read_timeout=self.http_read_timeout,
+            max_retries=self.http_max_retries,
+        )
                     
     def test_connection(self):
         """Test connection to Shopify API"""
         self.ensure_one()
         try:
-            headers = {
-                'X-Shopify-Access-Token': self.api_access_token,
-                'Content-Type': 'application/json'
-            }
-            
-            url = f"https://{self.shopify_store_url}/admin/api/{self.api_version}/shop.json"
-            response = requests.get(url, headers=headers, timeout=30)
+            response = self._get_shopify_client().get('shop.json')
             
             if response.status_code == 200:
                 shop_data = response.json().get('shop', {})
@@ -111,10 +355,12 @@ class ShopifyConnector(models.Model):
         """Manual order import trigger"""
         self.ensure_one()
         try:
-            imported_count = self._import_orders()
-            self.last_sync_status = 'success'
-            self.last_sync_message = f'Successfully imported {imported_count} orders'
-            
+            with self._acquire_import_slot(bounded=False) as acquired:
+                if not acquired:
+                    raise UserError(_('An import is already running for this connector'))
+                with self._track_sync_run('manual') as stats:
+                    imported_count = self._import_orders(stats=stats)
+                    
             return {
                 'type': 'ir.actions.client',
                 'tag': 'display_notification',
@@ -126,161 +372,470 @@ class ShopifyConnector(models.Model):
                 }
             }
         except Exception as e:
-            self.last_sync_status = 'error'
-            self.last_sync_message = str(e)
             raise UserError(_('Import failed: %s') % str(e))
 
-    def _import_orders(self):
-        """Import orders from Shopify"""
+    def _import_orders(self, stats=None):
+        """Import orders from Shopify
+
+        Only orders updated since the sync watermark (minus the overlap
+        window) are fetched, by ascending update time. After each page, the
+        cursor of the next page and the highest update time processed are
+        saved and committed, so an interrupted import resumes where it
+        stopped instead of starting over. Pages, bytes and timings are
+        collected in ``stats`` when given.
+        """
         self.ensure_one()
+        stats = stats or SyncStats()
         
-        headers = {
-            'X-Shopify-Access-Token': self.api_access_token,
-            'Content-Type': 'application/json'
-        }
+        client = self._get_shopify_client()
         
-        # Build URL with parameters
-        url = f"https://{self.shopify_store_url}/admin/api/{self.api_version}/orders.json"
+        # Build request parameters
         params = {
             'status': 'any',
-            'limit': 250
+            'order': 'updated_at asc',
+            # Only the fields mapped into Odoo
+            'fields': rest_order_fields(),
         }
         
         # Add date filter if specified
         if self.import_from_date:
-            params['created_at_min'] = self.import_from_date.isoformat()
-        elif self.last_order_import:
-            params['updated_at_min'] = self.last_order_import.isoformat()
+            params['created_at_min'] = format_datetime(self.import_from_date)
+            
+        # Only fetch the delta since the watermark
+        watermark = self.sync_watermark or self.last_order_import
+        if watermark:
+            overlap = timedelta(minutes=max(self.sync_overlap_minutes, 0))
+            params['updated_at_min'] = format_datetime(watermark - overlap)
+            
+        # Resume an interrupted import
+        if self.import_checkpoint_updated_at:
+            params['updated_at_min'] = format_datetime(self.import_checkpoint_updated_at)
+        resume_cursor = self.import_checkpoint_cursor
             
         imported_count = 0
-        page_info = None
+        max_updated_at = self.import_checkpoint_updated_at
+        try:
+            pages = client.iter_pages(
+                'orders.json', 'orders', params=params, page_info=resume_cursor,
+                # The body is read while parsing, its reads count as HTTP time
+                read_timer=functools.partial(stats.timer, 'http'),
+            )
+            for page in stats.iter_timed('http', pages):
+                stats.add('pages')
+                # Orders are decoded one by one from the streamed page
+                batches = tools.split_every(self._get_import_batch_size(), page.items, list)
+                for orders_data in stats.iter_timed('parse', batches):
+                    imported_count += len(self._import_order_page(orders_data, stats=stats))
+                    self._commit_progress()
+                    max_updated_at = max(filter(None, [max_updated_at] + [
+                        parse_datetime(order_data.get('updated_at')) for order_data in orders_data
+                    ]), default=None)
+                    
+                stats.add('bytes', page.bytes_received)
+                resume_cursor = False
+                self.write({
+                    'import_checkpoint_cursor': page.next_page_info or False,
+                    'import_checkpoint_updated_at': max_updated_at,
+                })
+                self._commit_progress()
+        except ShopifyError as e:
+            if resume_cursor:
+                # Cursors expire, fall back to the checkpointed update time
+                _logger.warning(f"Import checkpoint cursor rejected for connector {self.name}: {e}")
+                self.import_checkpoint_cursor = False
+                return self._import_orders(stats=stats)
+            raise UserError(_('API Error: %s') % str(e))
+                
+        self.write({
+            'last_order_import': fields.Datetime.now(),
+            'sync_watermark': max(filter(None, [self.sync_watermark, max_updated_at]), default=False),
+            'import_checkpoint_cursor': False,
+            'import_checkpoint_updated_at': False,
+        })
         
-        while True:
-            if page_info:
-                current_url = f"{url}?page_info={page_info}"
-                response = requests.get(current_url, headers=headers, timeout=30)
-            else:
-                response = requests.get(url, headers=headers, params=params, timeout=30)
+        return imported_count
+
+    def action_start_bulk_import(self):
+        """Start a bulk backfill of orders, imported by the connector's cron once Shopify is done"""
+        self.ensure_one()
+        try:
+            self._start_bulk_import()
+        except ShopifyError as e:
+            raise UserError(_('Could not start bulk import: %s') % str(e))
             
-            if response.status_code != 200:
-                raise UserError(_('API Error: %s') % response.text)
-                
-            data = response.json()
-            orders = data.get('orders', [])
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Bulk Import Started'),
+                'message': _('Shopify is preparing the orders, they will be imported as soon as the export is ready'),
+                'type': 'info',
+                'sticky': False,
+            }
+        }
+
+    def _start_bulk_import(self):
+        """Start a GraphQL bulk operation exporting the orders to backfill
+
+        The export is polled and imported by the connector's scheduled
+        import, which must therefore be enabled.
+        """
+        self.ensure_one()
+        if self.bulk_operation_id:
+            raise UserError(_('A bulk import is already running for %s') % self.name)
+        if not self.is_active or not self.auto_import_orders:
+            raise UserError(_('Enable the connector and its automatic import to run a bulk import'))
             
-            for order_data in orders:
-                try:
-                    self._process_shopify_order(order_data)
-                    imported_count += 1
-                except Exception as e:
-                    _logger.error(f"Error processing order {order_data.get('id')}: {e}")
+        data = self._get_shopify_client().graphql(
+            shopify_bulk.RUN_QUERY_MUTATION,
+            {'query': shopify_bulk.build_orders_query(self.import_from_date)}
+        )
+        result = data.get('bulkOperationRunQuery') or {}
+        if result.get('userErrors'):
+            raise ShopifyError('; '.join(error['message'] for error in result['userErrors']))
+            
+        operation = result['bulkOperation']
+        self.write({
+            'bulk_operation_id': operation['id'],
+            'bulk_operation_status': operation['status'],
+        })
+        # Poll the export soon rather than at the next scheduled sync
+        self.import_cron_id._trigger(fields.Datetime.now() + timedelta(minutes=1))
+
+    def _check_bulk_import(self):
+        """Poll the running bulk operation and import its result once complete
+
+        Returns the number of imported orders, or None while Shopify is
+        still running the operation. The operation is only forgotten, and the
+        watermark moved, once its file has been fully imported: an interrupted
+        import reads the file again, already imported orders being skipped.
+        """
+        self.ensure_one()
+        client = self._get_shopify_client()
+        data = client.graphql(shopify_bulk.OPERATION_QUERY, {'id': self.bulk_operation_id})
+        # Unknown or expired operations are gone for good
+        operation = data.get('node') or {'status': 'EXPIRED', 'errorCode': 'NOT_FOUND'}
+        status = operation.get('status')
+        
+        self.bulk_operation_status = status
+        if status not in shopify_bulk.FINISHED_STATUSES:
+            return None
+            
+        imported_count = 0
+        max_updated_at = self.sync_watermark
+        with self._track_sync_run('bulk') as stats:
+            if status != 'COMPLETED':
+                self.bulk_operation_id = False
+                raise UserError(_('Bulk import %s: %s') % (status.lower(), operation.get('errorCode') or ''))
+                
+            # No url means the query matched no orders
+            if operation.get('url'):
+                stats.add('pages')
+                # The file is downloaded while parsing, its reads count as HTTP time
+                lines = stats.iter_counted(stats.iter_timed('http', client.iter_download_lines(operation['url'])))
+                orders = shopify_bulk.iter_bulk_orders(lines)
+                batches = tools.split_every(self._get_import_batch_size(), orders, list)
+                for orders_data in stats.iter_timed('parse', batches):
+                    imported_count += len(self._import_order_page(orders_data, stats=stats))
+                    self._commit_progress()
+                    max_updated_at = max(filter(None, [max_updated_at] + [
+                        parse_datetime(order_data.get('updated_at')) for order_data in orders_data
+                    ]), default=False)
                     
-            # Check for pagination
-            link_header = response.headers.get('Link', '')
-            if 'rel="next"' in link_header:
-                # Extract page_info from link header
-                import re
-                match = re.search(r'page_info=([^&>]+)', link_header)
-                if match:
-                    page_info = match.group(1)
+        # The export is a snapshot, incremental imports can carry on from it
+        self.write({
+            'bulk_operation_id': False,
+            'sync_watermark': max_updated_at,
+        })
+        return imported_count
+
+    def _import_orders_bulk(self, poll_interval=5, timeout=3600):
+        """Run a bulk backfill to completion: start it, wait for Shopify, import"""
+        self.ensure_one()
+        self._start_bulk_import()
+        deadline = time.monotonic() + timeout
+        
+        while True:
+            imported_count = self._check_bulk_import()
+            if imported_count is not None:
+                return imported_count
+            if time.monotonic() > deadline:
+                raise UserError(_('Bulk import did not complete within %s seconds') % timeout)
+            time.sleep(poll_interval)
+
+    def _get_import_batch_size(self):
+        self.ensure_one()
+        return max(self.import_batch_size, 1)
+
+    def _import_order_page(self, orders_data, errors=None, stats=None):
+        """Import a page of Shopify orders, creating new orders in batch
+
+        Existing orders get their status updated, new orders are created
+        with a single ``sale.order`` create and a single ``sale.order.line``
+        create for the whole page. Every order is isolated in a savepoint:
+        orders that fail are logged and skipped without affecting the rest;
+        their error messages are collected by Shopify order id in ``errors``
+        when a dict is given. Outcomes and timings are added to ``stats``.
+        """
+        self.ensure_one()
+        stats = stats or SyncStats()
+        start = time.perf_counter()
+        processed_orders = self.env['sale.order']
+        # Created or updated orders, checked for auto-confirmation at the end
+        changed_orders = self.env['sale.order']
+        new_orders_data = {}
+        page_errors = {}
+        outcomes = dict.fromkeys(('created', 'updated', 'skipped', 'failed'), 0)
+        
+        # Load every already imported order of the page with a single query
+        existing_orders = self._get_existing_orders(
+            [str(order_data['id']) for order_data in orders_data]
+        )
+        
+        for order_data in orders_data:
+            shopify_order_id = str(order_data['id'])
+            try:
+                existing_order = existing_orders.get(shopify_order_id)
+                if existing_order and self._is_order_unchanged(existing_order, order_data):
+                    processed_orders |= existing_order
+                    outcomes['skipped'] += 1
+                elif existing_order:
+                    with stats.timer('create'), self.env.cr.savepoint():
+                        self._update_order_status(existing_order, order_data)
+                    changed_orders |= existing_order
+                    outcomes['updated'] += 1
                 else:
-                    break
-            else:
-                break
+                    # Later payloads for the same order win
+                    new_orders_data[shopify_order_id] = order_data
+            except Exception as e:
+                _logger.error(f"Error processing order {shopify_order_id}: {e}")
+                page_errors[shopify_order_id] = str(e)
                 
-        self.last_order_import = fields.Datetime.now()
-        self.total_orders_imported += imported_count
+        if new_orders_data:
+            try:
+                with self.env.cr.savepoint():
+                    changed_orders |= self._create_sale_orders(
+                        list(new_orders_data.values()), errors=page_errors, stats=stats
+                    )
+            except Exception as e:
+                # Retry one by one so that a single bad order doesn't fail the batch
+                _logger.warning(f"Batch creation failed, creating orders one by one: {e}")
+                for shopify_order_id, order_data in new_orders_data.items():
+                    try:
+                        with self.env.cr.savepoint():
+                            changed_orders |= self._create_sale_orders([order_data], stats=stats)
+                        page_errors.pop(shopify_order_id, None)
+                    except Exception as e:
+                        _logger.error(f"Error processing order {shopify_order_id}: {e}")
+                        page_errors[shopify_order_id] = str(e)
+            outcomes['created'] = len(new_orders_data.keys() - page_errors.keys())
+            
+        with stats.timer('confirm'):
+            self._confirm_paid_orders(changed_orders)
+        processed_orders |= changed_orders
         
-        return imported_count
+        outcomes['failed'] = len(page_errors)
+        for outcome, count in outcomes.items():
+            stats.add(outcome, count)
+            metrics.ORDERS_PROCESSED.inc(count, shop=self.shopify_shop_domain, outcome=outcome)
+        metrics.ORDER_BATCH_DURATION.observe(time.perf_counter() - start, shop=self.shopify_shop_domain)
+        if errors is not None:
+            errors.update(page_errors)
+        return processed_orders
+
+    def _get_existing_orders(self, shopify_order_ids):
+        """Map Shopify order ids to the sale orders already imported for them
 
-    def _process_shopify_order(self, order_data):
-        """Process a single Shopify order"""
-        shopify_order_id = str(order_data['id'])
+        Orders imported before connector ownership was recorded have no
+        connector set and are matched as well, orders of this connector
+        taking precedence.
+        """
+        self.ensure_one()
+        if not shopify_order_ids:
+            return {}
+            
+        orders = self.env['sale.order'].search([
+            ('shopify_order_id', 'in', list(set(shopify_order_ids))),
+            ('shopify_connector_id', 'in', [self.id, False]),
+        ])
         
-        # Check if order already exists
-        existing_order = self.env['sale.order'].search([
-            ('shopify_order_id', '=', shopify_order_id)
-        ], limit=1)
+        existing_orders = {}
+        for order in orders:
+            if order.shopify_connector_id or order.shopify_order_id not in existing_orders:
+                existing_orders[order.shopify_order_id] = order
+        return existing_orders
+
+    def _create_sale_orders(self, orders_data, errors=None, stats=None):
+        """Create sale orders and their lines for new Shopify orders
+
+        All orders are created with one multi-record create, then all their
+        product and shipping lines with another.
+        """
+        stats = stats or SyncStats()
+        order_vals_list = []
+        prepared_orders_data = []
+        # Resolve the customers and delivery addresses of every order in one go
+        with stats.timer('partner'):
+            partners = self._resolve_customers(orders_data)
+            order_partners = [partners[str(order_data.get('id'))] for order_data in orders_data]
+            shipping_partners = self._resolve_shipping_addresses([
+                (partner, order_data.get('shipping_address'))
+                for partner, order_data in zip(order_partners, orders_data)
+            ])
+        for order_data, partner, shipping_partner in zip(orders_data, order_partners, shipping_partners):
+            try:
+                # Partners are resolved already, preparing the values writes nothing
+                order_vals_list.append(self._prepare_order_vals(
+                    order_data, partner=partner, shipping_partner=shipping_partner
+                ))
+                prepared_orders_data.append(order_data)
+            except Exception as e:
+                if len(orders_data) == 1 and errors is None:
+                    raise
+                _logger.error(f"Error processing order {order_data.get('id')}: {e}")
+                if errors is not None:
+                    errors[str(order_data.get('id'))] = str(e)
+                
+        with stats.timer('create'):
+            sale_orders = self.env['sale.order'].create(order_vals_list)
+        
+        # Resolve the products of every line item in one go
+        with stats.timer('product'):
+            products = self._resolve_line_item_products([
+                line_item
+                for order_data in prepared_orders_data
+                for line_item in order_data.get('line_items', [])
+            ])
         
-        if existing_order:
-            # Update existing order status if needed
-            self._update_order_status(existing_order, order_data)
-            return existing_order
+        # Resolved once for the whole batch
+        shipping_product = None
+        if any(order_data.get('shipping_lines') for order_data in prepared_orders_data):
+            with stats.timer('product'):
+                shipping_product = self._get_shipping_product()
+        
+        line_vals_list = []
+        for sale_order, order_data in zip(sale_orders, prepared_orders_data):
+            for line_item in order_data.get('line_items', []):
+                product = products.get(self._get_variant_key(line_item))
+                line_vals_list.append(self._prepare_order_line_vals(sale_order, line_item, product))
+                
+            # Add shipping costs if any
+            for shipping_line in order_data.get('shipping_lines', []):
+                line_vals_list.append(self._prepare_shipping_line_vals(sale_order, shipping_line, shipping_product))
+                
+        if line_vals_list:
+            with stats.timer('create'):
+                self.env['sale.order.line'].create(line_vals_list)
             
+        return sale_orders
+
+    def _prepare_order_vals(self, order_data, partner=None, shipping_partner=None):
+        """Prepare sale order values from Shopify order data"""
         # Create or find customer
-        partner = self._find_or_create_customer(order_data)
+        if not partner:
+            partner = self._find_or_create_customer(order_data)
+            shipping_partner = self._create_shipping_address(partner, order_data.get('shipping_address'))
         
-        # Create sale order
         order_vals = {
             'partner_id': partner.id,
-            'shopify_order_id': shopify_order_id,
+            'shopify_order_id': str(order_data['id']),
+            'shopify_connector_id': self.id,
             'shopify_order_number': order_data.get('name', ''),
             'is_shopify_order': True,
             'shopify_financial_status': order_data.get('financial_status', 'pending'),
             'shopify_fulfillment_status': order_data.get('fulfillment_status', 'unfulfilled'),
-            'date_order': fields.Datetime.from_string(order_data['created_at']),
+            'date_order': parse_datetime(order_data['created_at']),
             'note': order_data.get('note', ''),
             'client_order_ref': order_data.get('name', ''),
+            'shopify_payload_hash': order_fingerprint(order_data),
         }
         
         # Set shipping address if different
-        shipping_address = order_data.get('shipping_address')
-        if shipping_address:
-            shipping_partner = self._create_shipping_address(partner, shipping_address)
-            if shipping_partner:
-                order_vals['partner_shipping_id'] = shipping_partner.id
-        
-        sale_order = self.env['sale.order'].create(order_vals)
-        
-        # Create order lines
-        for line_item in order_data.get('line_items', []):
-            self._create_order_line(sale_order, line_item)
-            
-        # Add shipping costs if any
-        shipping_lines = order_data.get('shipping_lines', [])
-        for shipping_line in shipping_lines:
-            self._create_shipping_line(sale_order, shipping_line)
-            
-        # Auto-confirm if paid and setting is enabled
-        if (self.auto_confirm_paid_orders and 
-            order_data.get('financial_status') == 'paid'):
-            try:
-                sale_order.action_confirm()
-            except Exception as e:
-                _logger.warning(f"Could not auto-confirm order {sale_order.name}: {e}")
+        if shipping_partner:
+            order_vals['partner_shipping_id'] = shipping_partner.id
                 
-        return sale_order
+        return order_vals
 
     def _find_or_create_customer(self, order_data):
         """Find existing customer or create new one"""
-        email = order_data.get('email')
-        customer_data = order_data.get('customer', {})
-        billing_address = order_data.get('billing_address', {})
+        return self._resolve_customers([order_data])[str(order_data.get('id'))]
+
+    def _resolve_customers(self, orders_data):
+        """Find or create the customers of a batch of Shopify orders
+
+        Customers are matched on their normalized email first, then on their
+        Shopify customer id, with one indexed query per key. The missing ones
+        are created with a single create, once per email or customer id.
+        Returns a dict mapping Shopify order ids to partners.
+        """
+        Partner = self.env['res.partner']
         
-        # Try to find existing customer by email
-        if email:
-            partner = self.env['res.partner'].search([('email', '=', email)], limit=1)
-            if partner:
-                return partner
+        # Collect the lookup keys of every order
+        order_keys = {}
+        for order_data in orders_data:
+            customer_data = order_data.get('customer') or {}
+            order_keys[str(order_data.get('id'))] = (
+                tools.email_normalize(order_data.get('email') or ''),
+                str(customer_data['id']) if customer_data.get('id') else False,
+            )
+            
+        emails = {email for email, _customer_id in order_keys.values() if email}
+        customer_ids = {customer_id for _email, customer_id in order_keys.values() if customer_id}
+        
+        partners_by_email = {}
+        if emails:
+            for partner in Partner.search([('email_normalized', 'in', list(emails))], order='id'):
+                partners_by_email.setdefault(partner.email_normalized, partner)
+        partners_by_customer_id = {}
+        if customer_ids:
+            for partner in Partner.search([('shopify_customer_id', 'in', list(customer_ids))], order='id'):
+                partners_by_customer_id.setdefault(partner.shopify_customer_id, partner)
                 
-        # Try to find by Shopify customer ID
-        shopify_customer_id = customer_data.get('id')
-        if shopify_customer_id:
-            partner = self.env['res.partner'].search([
-                ('shopify_customer_id', '=', str(shopify_customer_id))
-            ], limit=1)
+        partners = {}
+        missing = {}
+        for order_data in orders_data:
+            shopify_order_id = str(order_data.get('id'))
+            email, customer_id = order_keys[shopify_order_id]
+            partner = partners_by_email.get(email) or partners_by_customer_id.get(customer_id)
             if partner:
-                return partner
+                partners[shopify_order_id] = partner
+            else:
+                # Orders of the same customer share the partner created for them
+                missing.setdefault(email or customer_id or shopify_order_id, []).append(order_data)
                 
+        if not missing:
+            return partners
+            
         # Create new customer if setting is enabled
         if not self.create_customers:
             # Return a default customer or raise an error
-            default_partner = self.env.ref('base.public_partner', raise_if_not_found=False)
-            if default_partner:
-                return default_partner
-            raise UserError(_('Customer creation is disabled and no default customer found'))
+            default_partner_id = self._get_public_partner_id()
+            if not default_partner_id:
+                raise UserError(_('Customer creation is disabled and no default customer found'))
+            default_partner = Partner.browse(default_partner_id)
+            for key_orders_data in missing.values():
+                for order_data in key_orders_data:
+                    partners[str(order_data.get('id'))] = default_partner
+            return partners
             
-        # Create new customer
+        # Create new customers
+        new_partners = Partner.create([
+            self._prepare_customer_vals(key_orders_data[0])
+            for key_orders_data in missing.values()
+        ])
+        for partner, key_orders_data in zip(new_partners, missing.values()):
+            for order_data in key_orders_data:
+                partners[str(order_data.get('id'))] = partner
+                
+        return partners
+
+    def _prepare_customer_vals(self, order_data):
+        """Prepare customer values from Shopify order data"""
+        email = order_data.get('email')
+        customer_data = order_data.get('customer') or {}
+        billing_address = order_data.get('billing_address') or {}
+        shopify_customer_id = customer_data.get('id')
+        
         partner_vals = {
             'name': billing_address.get('name') or customer_data.get('first_name', '') + ' ' + customer_data.get('last_name', ''),
             'email': email,
@@ -288,79 +843,108 @@ class ShopifyConnector(models.Model):
             'is_company': False,
             'customer_rank': 1,
             'shopify_customer_id': str(shopify_customer_id) if shopify_customer_id else False,
+            'is_shopify_customer': True,
         }
         
         # Add address information
         if billing_address:
-            partner_vals.update({
-                'street': billing_address.get('address1', ''),
-                'street2': billing_address.get('address2', ''),
-                'city': billing_address.get('city', ''),
-                'zip': billing_address.get('zip', ''),
-            })
-            
-            # Find country
-            country_code = billing_address.get('country_code')
-            if country_code:
-                country = self.env['res.country'].search([('code', '=', country_code)], limit=1)
-                if country:
-                    partner_vals['country_id'] = country.id
-                    
-                    # Find state
-                    province_code = billing_address.get('province_code')
-                    if province_code:
-                        state = self.env['res.country.state'].search([
-                            ('code', '=', province_code),
-                            ('country_id', '=', country.id)
-                        ], limit=1)
-                        if state:
-                            partner_vals['state_id'] = state.id
-                            
-        return self.env['res.partner'].create(partner_vals)
+            partner_vals.update(self._prepare_address_vals(billing_address))
+            
+        return partner_vals
 
     def _create_shipping_address(self, partner, shipping_address):
-        """Create shipping address if different from billing"""
-        if not shipping_address:
-            return None
+        """Find or create shipping address if different from billing"""
+        return self._resolve_shipping_addresses([(partner, shipping_address)])[0]
+
+    def _resolve_shipping_addresses(self, partner_addresses):
+        """Find or create the delivery contacts of a batch of shipping addresses
+
+        ``partner_addresses`` is a list of (customer, Shopify address) pairs.
+        Addresses are matched on the normalized address hash of the delivery
+        contacts of their customer, with a single query for the batch, and
+        the missing contacts are created with a single create. Returns the
+        delivery contacts in the same order, ``None`` where the address is
+        missing or the same as billing.
+        """
+        Partner = self.env['res.partner']
+        
+        address_keys = []
+        for partner, shipping_address in partner_addresses:
+            # Check if shipping address is the same as billing
+            if not shipping_address or (
+                    partner.street == shipping_address.get('address1', '') and
+                    partner.city == shipping_address.get('city', '') and
+                    partner.zip == shipping_address.get('zip', '')):
+                address_keys.append(None)
+            else:
+                address_keys.append((partner.id, self._get_address_hash(shipping_address)))
+                
+        keys = {key for key in address_keys if key}
+        if not keys:
+            return [None] * len(partner_addresses)
             
-        # Check if shipping address is the same as billing
-        if (partner.street == shipping_address.get('address1', '') and
-            partner.city == shipping_address.get('city', '') and
-            partner.zip == shipping_address.get('zip', '')):
-            return None
+        delivery_partners = {}
+        for delivery_partner in Partner.search([
+            ('type', '=', 'delivery'),
+            ('parent_id', 'in', list({parent_id for parent_id, _address_hash in keys})),
+            ('shopify_address_hash', 'in', list({address_hash for _parent_id, address_hash in keys})),
+        ], order='id'):
+            delivery_partners.setdefault(
+                (delivery_partner.parent_id.id, delivery_partner.shopify_address_hash), delivery_partner
+            )
+            
+        # Create new delivery contacts, once per customer and address
+        shipping_vals = {}
+        for (partner, shipping_address), key in zip(partner_addresses, address_keys):
+            if key and key not in delivery_partners and key not in shipping_vals:
+                shipping_vals[key] = dict(
+                    self._prepare_address_vals(shipping_address),
+                    name=shipping_address.get('name', partner.name),
+                    parent_id=partner.id,
+                    type='delivery',
+                    phone=shipping_address.get('phone', ''),
+                    shopify_address_hash=key[1],
+                )
+        if shipping_vals:
+            new_partners = Partner.create(list(shipping_vals.values()))
+            delivery_partners.update(zip(shipping_vals, new_partners))
             
-        shipping_vals = {
-            'name': shipping_address.get('name', partner.name),
-            'parent_id': partner.id,
-            'type': 'delivery',
-            'street': shipping_address.get('address1', ''),
-            'street2': shipping_address.get('address2', ''),
-            'city': shipping_address.get('city', ''),
-            'zip': shipping_address.get('zip', ''),
-            'phone': shipping_address.get('phone', ''),
+        return [delivery_partners[key] if key else None for key in address_keys]
+
+    def _get_address_hash(self, address):
+        """Return a hash of a Shopify address, insensitive to case and spacing"""
+        values = [
+            ' '.join(str(address.get(field) or '').lower().split())
+            for field in ADDRESS_HASH_FIELDS
+        ]
+        return hashlib.sha1('\x1f'.join(values).encode()).hexdigest()
+
+    def _prepare_address_vals(self, address):
+        """Prepare partner address values from a Shopify address"""
+        address_vals = {
+            'street': address.get('address1', ''),
+            'street2': address.get('address2', ''),
+            'city': address.get('city', ''),
+            'zip': address.get('zip', ''),
         }
         
         # Find country and state
-        country_code = shipping_address.get('country_code')
-        if country_code:
-            country = self.env['res.country'].search([('code', '=', country_code)], limit=1)
-            if country:
-                shipping_vals['country_id'] = country.id
+        country_code = address.get('country_code')
+        country_id = country_code and self._get_country_id(country_code)
+        if country_id:
+            address_vals['country_id'] = country_id
+            
+            province_code = address.get('province_code')
+            state_id = province_code and self._get_state_id(country_id, province_code)
+            if state_id:
+                address_vals['state_id'] = state_id
                 
-                province_code = shipping_address.get('province_code')
-                if province_code:
-                    state = self.env['res.country.state'].search([
-                        ('code', '=', province_code),
-                        ('country_id', '=', country.id)
-                    ], limit=1)
-                    if state:
-                        shipping_vals['state_id'] = state.id
-                        
-        return self.env['res.partner'].create(shipping_vals)
+        return address_vals
 
-    def _create_order_line(self, sale_order, line_item):
-        """Create sale order line from Shopify line item"""
-        product = self._find_product_for_line_item(line_item)
+    def _prepare_order_line_vals(self, sale_order, line_item, product=None):
+        """Prepare sale order line values from Shopify line item"""
+        if not product:
+            product = self._find_product_for_line_item(line_item)
         
         line_vals = {
             'order_id': sale_order.id,
@@ -371,24 +955,11 @@ class ShopifyConnector(models.Model):
             'shopify_line_item_id': str(line_item.get('id', '')),
         }
         
-        return self.env['sale.order.line'].create(line_vals)
+        return line_vals
 
-    def _create_shipping_line(self, sale_order, shipping_line):
-        """Create shipping line as order line"""
-        # Find or create shipping product
-        shipping_product = self.env['product.product'].search([
-            ('default_code', '=', 'SHIPPING'),
-            ('type', '=', 'service')
-        ], limit=1)
-        
-        if not shipping_product:
-            shipping_product = self.env['product.product'].create({
-                'name': 'Shipping',
-                'default_code': 'SHIPPING',
-                'type': 'service',
-                'sale_ok': True,
-                'purchase_ok': False,
-            })
+    def _prepare_shipping_line_vals(self, sale_order, shipping_line, shipping_product=None):
+        """Prepare shipping line values as order line"""
+        shipping_product = shipping_product or self._get_shipping_product()
             
         line_vals = {
             'order_id': sale_order.id,
@@ -398,7 +969,119 @@ class ShopifyConnector(models.Model):
             'price_unit': float(shipping_line.get('price', 0)),
         }
         
-        return self.env['sale.order.line'].create(line_vals)
+        return line_vals
+
+    def _get_shipping_product(self):
+        """Find or create the product used for shipping lines
+
+        The module ships it as ``product_shopify_shipping``. Only when it was
+        deleted is it searched by code, or created again. Each call costs a
+        query or more, callers resolve it once per batch.
+        """
+        shipping_product = self.env.ref('bitzify_shopify_odoo_connector.product_shopify_shipping', raise_if_not_found=False)
+        if shipping_product:
+            return shipping_product
+            
+        shipping_product = self.env['product.product'].search([
+            ('default_code', '=', 'SHIPPING'),
+            ('type', '=', 'service')
+        ], limit=1)
+        if shipping_product:
+            return shipping_product
+            
+        return self.env['product.product'].create({
+            'name': 'Shipping',
+            'default_code': 'SHIPPING',
+            'type': 'service',
+            'sale_ok': True,
+            'purchase_ok': False,
+        })
+
+    # Reference data resolvers
+    #
+    # Countries, states and the public partner almost never change, so their ids are memoized per worker process, until
+    # the registry caches are cleared, e.g. by a module update.
+
+    @api.model
+    @tools.ormcache('country_code')
+    def _get_country_id(self, country_code):
+        """Return the id of the country with the given ISO code"""
+        return self.env['res.country'].search([('code', '=', country_code.upper())], limit=1).id
+
+    @api.model
+    @tools.ormcache('country_id', 'state_code')
+    def _get_state_id(self, country_id, state_code):
+        """Return the id of the state with the given code in a country"""
+        return self.env['res.country.state'].search([
+            ('code', '=', state_code),
+            ('country_id', '=', country_id)
+        ], limit=1).id
+
+    @api.model
+    @tools.ormcache()
+    def _get_public_partner_id(self):
+        """Return the id of the public partner used as fallback customer"""
+        public_partner = self.env.ref('base.public_partner', raise_if_not_found=False)
+        return public_partner.id if public_partner else False
+
+    @api.model
+    def _get_variant_key(self, line_item):
+        """Return the (product id, variant id) key of a line item, if any"""
+        if not line_item.get('product_id') or not line_item.get('variant_id'):
+            return None
+        return (str(line_item['product_id']), str(line_item['variant_id']))
+
+    def _resolve_line_item_products(self, line_items):
+        """Map variant keys of line items to their Odoo products
+
+        Known variants are read from the mapping table with a single query.
+        Variants seen for the first time are resolved once through
+        _find_product_for_line_item and recorded in the mapping table.
+        Line items without a variant (custom items) are left out.
+        """
+        self.ensure_one()
+        line_items_by_key = {}
+        for line_item in line_items:
+            variant_key = self._get_variant_key(line_item)
+            if variant_key:
+                line_items_by_key.setdefault(variant_key, line_item)
+                
+        if not line_items_by_key:
+            return {}
+            
+        product_maps = self.env['bitzify.shopify.product.map'].search([
+            ('connector_id', '=', self.id),
+            ('shopify_variant_id', 'in', [variant_id for _product_id, variant_id in line_items_by_key]),
+        ])
+        products = {
+            (product_map.shopify_product_id, product_map.shopify_variant_id): product_map.product_id
+            for product_map in product_maps
+        }
+        
+        new_map_vals_list = []
+        for variant_key, line_item in line_items_by_key.items():
+            if variant_key in products:
+                continue
+            product = self._find_product_for_line_item(line_item)
+            products[variant_key] = product
+            # Don't pin variants to the fallback product
+            if product != self.default_product_id:
+                new_map_vals_list.append({
+                    'connector_id': self.id,
+                    'shopify_product_id': variant_key[0],
+                    'shopify_variant_id': variant_key[1],
+                    'product_id': product.id,
+                })
+                
+        if new_map_vals_list:
+            try:
+                with self.env.cr.savepoint():
+                    self.env['bitzify.shopify.product.map'].create(new_map_vals_list)
+            except psycopg2.IntegrityError:
+                # Another worker mapped the same variants concurrently
+                _logger.info(f"Variant mappings for connector {self.name} were created concurrently")
+                
+        return products
 
     def _find_product_for_line_item(self, line_item):
         """Find or create product for line item"""
@@ -434,12 +1117,66 @@ class ShopifyConnector(models.Model):
         
         return self.env['product.product'].create(product_vals)
 
+    def _is_order_unchanged(self, sale_order, order_data):
+        """Check whether an imported order has nothing to update from its payload
+
+        Cosmetic Shopify updates (tags, metafields, ...) leave the fingerprint
+        untouched. Orders still waiting for their auto-confirmation are never
+        considered unchanged so that it gets retried, unless it already
+        failed: those are listed with their error until Shopify changes them.
+        """
+        return (
+            sale_order.shopify_connector_id
+            and sale_order.shopify_payload_hash == order_fingerprint(order_data)
+            and (
+                sale_order.shopify_confirmation_error
+                or not self._is_auto_confirm_pending(sale_order, order_data.get('financial_status'))
+            )
+        )
+
+    def _is_auto_confirm_pending(self, sale_order, financial_status):
+        """Check whether a draft order should be confirmed as paid"""
+        return financial_status == 'paid' and sale_order.state == 'draft' and self.auto_confirm_paid_orders
+
+    def _confirm_paid_orders(self, sale_orders):
+        """Confirm the paid orders awaiting auto-confirmation, as a single recordset
+
+        Falls back to one savepoint per order when the batch fails; orders
+        that still cannot be confirmed keep the reason in
+        ``shopify_confirmation_error``.
+        """
+        sale_orders = sale_orders.filtered(
+            lambda order: self._is_auto_confirm_pending(order, order.shopify_financial_status)
+        )
+        if not sale_orders:
+            return
+            
+        try:
+            with self.env.cr.savepoint():
+                sale_orders.action_confirm()
+        except Exception as e:
+            _logger.warning(f"Batch confirmation failed, confirming orders one by one: {e}")
+            for sale_order in sale_orders:
+                try:
+                    with self.env.cr.savepoint():
+                        sale_order.action_confirm()
+                except Exception as e:
+                    _logger.warning(f"Could not auto-confirm order {sale_order.name}: {e}")
+                    sale_order.shopify_confirmation_error = str(e)
+
     def _update_order_status(self, sale_order, order_data):
         """Update existing order status"""
         financial_status = order_data.get('financial_status', 'pending')
         fulfillment_status = order_data.get('fulfillment_status', 'unfulfilled')
+        fingerprint = order_fingerprint(order_data)
         
         updates = {}
+        if not sale_order.shopify_connector_id:
+            updates['shopify_connector_id'] = self.id
+            
+        if sale_order.shopify_payload_hash != fingerprint:
+            updates['shopify_payload_hash'] = fingerprint
+            
         if sale_order.shopify_financial_status != financial_status:
             updates['shopify_financial_status'] = financial_status
             
@@ -449,23 +1186,46 @@ class ShopifyConnector(models.Model):
         if updates:
             sale_order.write(updates)
             
-        # Auto-confirm if became paid
-        if (financial_status == 'paid' and 
-            sale_order.state == 'draft' and 
-            self.auto_confirm_paid_orders):
-            try:
-                sale_order.action_confirm()
-            except Exception as e:
-                _logger.warning(f"Could not auto-confirm order {sale_order.name}: {e}")
+        # Paid orders are confirmed by the caller, together with the rest of the page
+
+    def _cancel_shopify_order(self, order_data):
+        """Cancel the sale order of a Shopify order cancelled in Shopify"""
+        self.ensure_one()
+        shopify_order_id = str(order_data.get('id'))
+        
+        # Find existing order
+        order = self._get_existing_orders([shopify_order_id]).get(shopify_order_id)
+        if not order:
+            return order
+            
+        # Cancel the order if it's not already done
+        if order.state not in ['done', 'cancel']:
+            order.action_cancel()
+            
+        # Update Shopify status
+        order.write({
+            'shopify_financial_status': 'voided',
+            'shopify_fulfillment_status': 'restocked',
+            # Statuses no longer match the last payload
+            'shopify_payload_hash': False,
+        })
+        return order
 
-    def verify_webhook(self, data, hmac_header):
-        """Verify Shopify webhook signature"""
-        if not self.webhook_secret:
+    @api.model
+    def _commit_progress(self):
+        """Commit the work done so far, except when running tests"""
+        if not getattr(threading.current_thread(), 'testing', False):
+            self.env.cr.commit()
+
+    @api.model
+    def _verify_webhook_signature(self, webhook_secret, data, hmac_header):
+        """Verify a Shopify webhook signature against a secret"""
+        if not webhook_secret:
             return True  # Skip verification if no secret configured
             
         calculated_hmac = base64.b64encode(
             hmac.new(
-                self.webhook_secret.encode('utf-8'),
+                webhook_secret.encode('utf-8'),
                 data,
                 hashlib.sha256
             ).digest()
@@ -473,24 +1233,135 @@ class ShopifyConnector(models.Model):
         
         return hmac.compare_digest(calculated_hmac, hmac_header)
 
+    @api.model
+    def _get_webhook_credentials(self, shop_domain):
+        """Return the (connector id, webhook secret) of the active connector of a shop
+
+        The credentials of all active connectors are loaded together and
+        kept by the worker process for ``WEBHOOK_CREDENTIALS_TTL`` seconds,
+        or until a connector of this process changes. Unknown shops are
+        answered from that map, so request headers never add entries.
+        """
+        dbname = self.env.cr.dbname
+        now = time.monotonic()
+        expiry, credentials = _webhook_credentials.get(dbname, (0, None))
+        if credentials is None or expiry < now:
+            # Lowest id first wins when several connectors share a shop
+            connectors = self.sudo().search([('is_active', '=', True)], order='id desc')
+            credentials = {
+                connector.shopify_shop_domain: (connector.id, connector.webhook_secret or False)
+                for connector in connectors
+            }
+            _webhook_credentials[dbname] = (now + WEBHOOK_CREDENTIALS_TTL, credentials)
+        return credentials.get(self._normalize_shop_domain(shop_domain), (0, False))
+
+    @api.model
+    def _clear_webhook_cache(self):
+        """Forget the webhook credentials loaded by this worker"""
+        _webhook_credentials.pop(self.env.cr.dbname, None)
+
     @api.model
     def cron_import_orders(self):
-        """Cron job to import orders automatically"""
+        """Trigger the scheduled import of every active connector now"""
         active_connectors = self.search([
             ('is_active', '=', True),
             ('auto_import_orders', '=', True)
         ])
-        
-        for connector in active_connectors:
+        active_connectors.filtered(lambda connector: not connector.import_cron_id)._sync_import_cron()
+        active_connectors.import_cron_id._trigger()
+
+    @api.model
+    def _cron_import_connector(self, connector_id):
+        """Scheduled import of one connector, run by the connector's own cron"""
+        connector = self.browse(connector_id).exists()
+        if not connector or not connector.is_active or not connector.auto_import_orders:
+            return
+            
+        with connector._acquire_import_slot() as acquired:
+            if not acquired:
+                # Connector already importing or too many imports running
+                _logger.info(f"Postponing order import for connector {connector.name}")
+                connector.import_cron_id._trigger(fields.Datetime.now() + timedelta(minutes=1))
+                return
+                
             try:
-                connector._import_orders()
+                if connector.bulk_operation_id:
+                    # The export covers every order, incremental imports
+                    # resume from its watermark once it is imported
+                    if connector._check_bulk_import() is None:
+                        # Still exporting, poll again shortly
+                        connector.import_cron_id._trigger(fields.Datetime.now() + timedelta(minutes=1))
+                    return
+                with connector._track_sync_run('cron') as stats:
+                    connector._import_orders(stats=stats)
                 _logger.info(f"Successfully imported orders for connector {connector.name}")
             except Exception as e:
+                # The failure is recorded by the sync run
                 _logger.error(f"Error importing orders for connector {connector.name}: {e}")
-                connector.write({
-                    'last_sync_status': 'error',
-                    'last_sync_message': str(e)
-                })
+
+    @contextmanager
+    def _track_sync_run(self, trigger):
+        """Record a sync run of the connector, yielding its statistics collector
+
+        The run is logged when the block exits, as failed if it raised. A
+        failed run is logged on a cursor of its own: the caller's transaction
+        may be aborted already, or rolled back by the error being raised.
+        """
+        self.ensure_one()
+        stats = SyncStats()
+        date_start = fields.Datetime.now()
+        start = time.perf_counter()
+        state, message = 'done', False
+        try:
+            yield stats
+        except Exception as e:
+            state, message = 'error', str(e)
+            raise
+        finally:
+            run_values = dict(
+                date_start=date_start,
+                duration=time.perf_counter() - start,
+                state=state,
+                message=message,
+            )
+            if state == 'done' or getattr(threading.current_thread(), 'testing', False):
+                self.env['bitzify.shopify.sync.run'].sudo()._log_run(self, trigger, stats, **run_values)
+            else:
+                with self.env.registry.cursor() as run_cr:
+                    connector = self.with_env(self.env(cr=run_cr))
+                    connector.env['bitzify.shopify.sync.run'].sudo()._log_run(connector, trigger, stats, **run_values)
+
+    @contextmanager
+    def _acquire_import_slot(self, bounded=True):
+        """Reserve the connector, and one of the parallel import slots if bounded
+
+        Yields whether the reservation succeeded. The advisory locks are
+        session locks of a separate autocommit connection: the import itself
+        may commit as it goes, and no transaction (nor snapshot) stays open
+        while it runs. They are released when the block exits (or the worker
+        dies).
+        """
+        self.ensure_one()
+        max_parallel = int(self.env['ir.config_parameter'].sudo().get_param(
+            'bitzify_shopify.max_parallel_imports', DEFAULT_MAX_PARALLEL_IMPORTS
+        ))
+        with sql_db.db_connect(self.env.cr.dbname).cursor() as lock_cr:
+            lock_cr._cnx.autocommit = True
+            try:
+                lock_cr.execute("SELECT pg_try_advisory_lock(%s, %s)", [IMPORT_LOCK_CONNECTOR, self.id])
+                acquired = lock_cr.fetchone()[0]
+                if acquired and bounded:
+                    for slot in range(max(max_parallel, 1)):
+                        lock_cr.execute("SELECT pg_try_advisory_lock(%s, %s)", [IMPORT_LOCK_SLOT, slot])
+                        if lock_cr.fetchone()[0]:
+                            break
+                    else:
+                        acquired = False
+                yield acquired
+            finally:
+                # The connection goes back to the pool, it must not keep any lock
+                lock_cr.execute("SELECT pg_advisory_unlock_all()")
+                lock_cr._cnx.autocommit = False
 
     def action_view_orders(self):
         """View orders imported by this connector"""
@@ -500,10 +1371,54 @@ class ShopifyConnector(models.Model):
             'name': f'Orders from {self.name}',
             'res_model': 'sale.order',
             'view_mode': 'tree,form',
-            'domain': [('is_shopify_order', '=', True)],
+            'domain': [('is_shopify_order', '=', True), ('shopify_connector_id', '=', self.id)],
             'context': {'search_default_is_shopify_order': 1},
         }
 
+    @api.model
+    def _backfill_order_connectors(self):
+        """Assign Shopify orders imported before ownership was recorded
+
+        Only possible when a single connector exists; with several, legacy
+        orders are adopted by the first connector that imports them again.
+        Concurrent webhooks may have imported a Shopify order twice: only
+        the oldest copy is adopted, the others are logged and left as is.
+        """
+        connector = self.search([])
+        if len(connector) != 1:
+            return
+        self.env['sale.order'].flush_model(['shopify_connector_id', 'shopify_order_id'])
+        self.env.cr.execute("""
+            UPDATE sale_order so SET shopify_connector_id = %s
+            WHERE so.is_shopify_order AND so.shopify_connector_id IS NULL
+              AND (so.shopify_order_id IS NULL OR (
+                  so.id IN (
+                      SELECT min(id) FROM sale_order
+                      WHERE is_shopify_order AND shopify_connector_id IS NULL
+                      GROUP BY shopify_order_id
+                  )
+                  AND NOT EXISTS (
+                      SELECT 1 FROM sale_order owned
+                      WHERE owned.shopify_connector_id = %s AND owned.shopify_order_id = so.shopify_order_id
+                  )
+              ))
+        """, [connector.id, connector.id])
+        if self.env.cr.rowcount:
+            _logger.info(f"Assigned {self.env.cr.rowcount} legacy Shopify orders to connector {connector.name}")
+            self.env['sale.order'].invalidate_model(['shopify_connector_id'])
+            
+        self.env.cr.execute("""
+            SELECT shopify_order_id, array_agg(name ORDER BY id)
+            FROM sale_order
+            WHERE is_shopify_order AND shopify_connector_id IS NULL AND shopify_order_id IS NOT NULL
+            GROUP BY shopify_order_id
+        """)
+        for shopify_order_id, names in self.env.cr.fetchall():
+            _logger.warning(
+                f"Shopify order {shopify_order_id} was imported more than once, "
+                f"duplicates {', '.join(names)} left without connector"
+            )
+
     def get_webhook_url(self):
         """Get the webhook URL for this Odoo instance"""
         base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
@@ -0,0 +1,28 @@
+from odoo import models, fields
+
+
+class ShopifyProductMap(models.Model):
+    _name = 'bitzify.shopify.product.map'
+    _description = 'Bitzify Shopify Variant Mapping'
+    _rec_name = 'product_id'
+
+    connector_id = fields.Many2one(
+        'bitzify.shopify.connector',
+        'Connector',
+        required=True,
+        ondelete='cascade'
+    )
+    shopify_product_id = fields.Char('Shopify Product ID', required=True)
+    shopify_variant_id = fields.Char('Shopify Variant ID', required=True)
+    product_id = fields.Many2one(
+        'product.product',
+        'Product',
+        required=True,
+        ondelete='cascade',
+        help='Odoo product used for order lines of this Shopify variant'
+    )
+
+    _sql_constraints = [
+        ('connector_variant_uniq', 'unique(connector_id, shopify_variant_id, shopify_product_id)',
+         'This Shopify variant is already mapped for this connector.'),
+    ]
@@ -0,0 +1,98 @@
+from odoo import models, fields, api, tools
+import logging
+from datetime import timedelta
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 90
+
+
+class ShopifySyncRun(models.Model):
+    _name = 'bitzify.shopify.sync.run'
+    _description = 'Bitzify Shopify Sync Run'
+    _order = 'date_start desc, id desc'
+    _rec_name = 'date_start'
+
+    connector_id = fields.Many2one(
+        'bitzify.shopify.connector',
+        'Connector',
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete='cascade'
+    )
+    trigger = fields.Selection([
+        ('cron', 'Scheduled'),
+        ('manual', 'Manual'),
+        ('webhook', 'Webhook'),
+        ('bulk', 'Bulk Backfill')
+    ], string='Trigger', required=True, readonly=True)
+    state = fields.Selection([
+        ('done', 'Done'),
+        ('error', 'Error')
+    ], string='State', required=True, readonly=True)
+    message = fields.Text('Message', readonly=True)
+    date_start = fields.Datetime('Started', required=True, readonly=True)
+    duration = fields.Float('Duration (s)', readonly=True)
+    
+    # Volume
+    pages_fetched = fields.Integer('Pages', readonly=True)
+    # Float: a bulk download may exceed the range of an integer column
+    bytes_received = fields.Float('Bytes Received', digits=(16, 0), readonly=True)
+    orders_created = fields.Integer('Created', readonly=True)
+    orders_updated = fields.Integer('Updated', readonly=True)
+    orders_skipped = fields.Integer('Skipped', readonly=True, help='Orders unchanged since their last import')
+    orders_failed = fields.Integer('Failed', readonly=True)
+    
+    # Time spent per stage, in seconds
+    http_time = fields.Float('HTTP (s)', readonly=True, help='Waiting for Shopify responses, bodies included')
+    parse_time = fields.Float('Parsing (s)', readonly=True, help='Decoding response bodies into orders')
+    partner_time = fields.Float('Partners (s)', readonly=True, help='Resolving customers and delivery addresses')
+    product_time = fields.Float('Products (s)', readonly=True, help='Resolving line item products')
+    create_time = fields.Float('Records (s)', readonly=True, help='Creating and updating sale orders')
+    confirm_time = fields.Float('Confirmation (s)', readonly=True, help='Confirming paid orders')
+
+    def init(self):
+        super().init()
+        # Latest import run of a connector, read for its statistics
+        tools.create_index(
+            self._cr, 'bitzify_shopify_sync_run_last_run_idx', self._table,
+            ['connector_id', 'date_start DESC', 'id DESC'], where="trigger != 'webhook'"
+        )
+
+    @api.model
+    def _log_run(self, connector, trigger, stats, date_start, duration, state='done', message=False):
+        """Store the statistics collected during a sync run"""
+        connector._clear_statistics_cache()
+        return self.create({
+            'connector_id': connector.id,
+            'trigger': trigger,
+            'state': state,
+            'message': message,
+            'date_start': date_start,
+            'duration': duration,
+            'pages_fetched': stats.counts['pages'],
+            'bytes_received': stats.counts['bytes'],
+            'orders_created': stats.counts['created'],
+            'orders_updated': stats.counts['updated'],
+            'orders_skipped': stats.counts['skipped'],
+            'orders_failed': stats.counts['failed'],
+            'http_time': stats.timings['http'],
+            'parse_time': stats.timings['parse'],
+            'partner_time': stats.timings['partner'],
+            'product_time': stats.timings['product'],
+            'create_time': stats.timings['create'],
+            'confirm_time': stats.timings['confirm'],
+        })
+
+    @api.autovacuum
+    def _gc_sync_runs(self):
+        """Purge old sync runs"""
+        retention_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'bitzify_shopify.sync_run_retention_days', DEFAULT_RETENTION_DAYS
+        ))
+        self.env.cr.execute("""
+            DELETE FROM bitzify_shopify_sync_run
+            WHERE date_start < %s
+        """, [fields.Datetime.now() - timedelta(days=retention_days)])
+        _logger.info("Purged %s Shopify sync runs", self.env.cr.rowcount)
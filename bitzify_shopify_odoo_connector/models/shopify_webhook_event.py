@@ -0,0 +1,205 @@
+from odoo import models, fields, api, _
+import json
+import logging
+import psycopg2
+from datetime import timedelta
+
+from ..tools import metrics
+
+_logger = logging.getLogger(__name__)
+
+ORDER_TOPICS = ('orders/create', 'orders/updated', 'orders/paid')
+CANCEL_TOPICS = ('orders/cancelled',)
+SUPPORTED_TOPICS = ORDER_TOPICS + CANCEL_TOPICS
+
+# Shopify retries failed deliveries for 48 hours
+DEFAULT_RETENTION_DAYS = 7
+
+
+class ShopifyWebhookEvent(models.Model):
+    _name = 'bitzify.shopify.webhook.event'
+    _description = 'Bitzify Shopify Webhook Event'
+    _order = 'id desc'
+    _rec_name = 'topic'
+
+    connector_id = fields.Many2one(
+        'bitzify.shopify.connector',
+        'Connector',
+        required=True,
+        readonly=True,
+        ondelete='cascade'
+    )
+    topic = fields.Char('Topic', required=True, readonly=True)
+    webhook_id = fields.Char(
+        'Webhook ID',
+        readonly=True,
+        help='X-Shopify-Webhook-Id of the delivery, identical for redeliveries'
+    )
+    payload = fields.Text('Payload', readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('error', 'Error')
+    ], string='State', default='pending', required=True, readonly=True, index=True)
+    error_message = fields.Text('Error Message', readonly=True)
+    processed_at = fields.Datetime('Processed At', readonly=True)
+
+    _sql_constraints = [
+        ('webhook_id_uniq', 'unique(webhook_id)', 'This webhook delivery has already been received.'),
+    ]
+
+    @api.model
+    def _enqueue(self, connector, topic, payload, webhook_id=None):
+        """Store a verified webhook delivery for asynchronous processing
+
+        Deliveries already received, identified by their webhook id, are
+        dropped and an empty recordset is returned.
+        """
+        if webhook_id and self.search([('webhook_id', '=', webhook_id)], limit=1):
+            return self.browse()
+            
+        try:
+            with self.env.cr.savepoint():
+                return self.create({
+                    'connector_id': connector.id,
+                    'topic': topic,
+                    'payload': payload,
+                    'webhook_id': webhook_id or False,
+                })
+        except psycopg2.IntegrityError:
+            # The same delivery is being received concurrently
+            return self.browse()
+
+    @api.autovacuum
+    def _gc_processed_events(self):
+        """Purge processed events once Shopify can no longer redeliver them"""
+        retention_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'bitzify_shopify.webhook_retention_days', DEFAULT_RETENTION_DAYS
+        ))
+        self.env.cr.execute("""
+            DELETE FROM bitzify_shopify_webhook_event
+            WHERE state = 'done' AND create_date < %s
+        """, [fields.Datetime.now() - timedelta(days=retention_days)])
+        _logger.info("Purged %s processed Shopify webhook events", self.env.cr.rowcount)
+
+    def action_retry(self):
+        """Put failed events back in the queue"""
+        self.filtered(lambda event: event.state == 'error').write({
+            'state': 'pending',
+            'error_message': False,
+        })
+
+    @api.model
+    def _cron_process_events(self, batch_size=200):
+        """Drain the webhook queue, one committed batch at a time
+
+        Events of connectors busy importing are left pending for the next run.
+        """
+        Connector = self.env['bitzify.shopify.connector']
+        busy_connector_ids = [0]
+        while True:
+            # Concurrent workers skip the events already claimed by others
+            self.env.cr.execute("""
+                SELECT id FROM bitzify_shopify_webhook_event
+                WHERE state = 'pending' AND connector_id NOT IN %s
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, [tuple(busy_connector_ids), batch_size])
+            events = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not events:
+                break
+            busy_connector_ids += events._process().ids
+            Connector._commit_progress()
+            if len(events) < batch_size:
+                break
+        self._update_queue_depth_metric()
+
+    @api.model
+    def _update_queue_depth_metric(self):
+        """Publish the number of pending events of every connector"""
+        pending = dict(self._read_group([('state', '=', 'pending')], ['connector_id'], ['__count']))
+        for connector in self.env['bitzify.shopify.connector'].search([]):
+            metrics.QUEUE_DEPTH.set(pending.get(connector, 0), shop=connector.shopify_shop_domain)
+
+    def _process(self):
+        """Process a batch of events, grouped by connector
+
+        Events are processed under their connector's import lock, so they
+        never create an order an import is creating at the same time. The
+        connectors already locked are returned, their events left pending.
+        """
+        busy_connectors = self.env['bitzify.shopify.connector']
+        for connector in self.connector_id:
+            events = self.filtered(lambda event: event.connector_id == connector)
+            connector_sudo = connector.sudo()
+            
+            with connector_sudo._acquire_import_slot(bounded=False) as acquired:
+                if not acquired:
+                    _logger.info(f'Postponing webhook events of connector {connector.name}, an import is running')
+                    busy_connectors |= connector
+                    continue
+                    
+                order_events = events.filtered(lambda event: event.topic in ORDER_TOPICS)
+                if order_events:
+                    order_events._process_order_events(connector_sudo)
+                    
+                for event in events.filtered(lambda event: event.topic in CANCEL_TOPICS):
+                    try:
+                        with self.env.cr.savepoint():
+                            connector_sudo._cancel_shopify_order(json.loads(event.payload))
+                        event._mark_done()
+                    except Exception as e:
+                        _logger.error(f'Error processing order cancellation: {e}', exc_info=True)
+                        event._mark_error(str(e))
+                        
+                (events - order_events).filtered(
+                    lambda event: event.topic not in CANCEL_TOPICS
+                )._mark_done()
+        return busy_connectors
+
+    def _process_order_events(self, connector):
+        """Import the orders of order events as a single page"""
+        orders_data = []
+        event_order_ids = {}
+        for event in self:
+            try:
+                order_data = json.loads(event.payload)
+                event_order_ids[event] = str(order_data['id'])
+                orders_data.append(order_data)
+            except Exception as e:
+                event._mark_error(_('Invalid payload: %s') % str(e))
+        if not orders_data:
+            return
+            
+        errors = {}
+        with connector._track_sync_run('webhook') as stats:
+            try:
+                with self.env.cr.savepoint():
+                    connector._import_order_page(orders_data, errors=errors, stats=stats)
+            except Exception as e:
+                _logger.error(f'Error processing order webhooks: {e}', exc_info=True)
+                errors = dict.fromkeys(event_order_ids.values(), str(e))
+                stats.add('failed', len(errors))
+            
+        done_events = self.browse()
+        for event, shopify_order_id in event_order_ids.items():
+            if shopify_order_id in errors:
+                event._mark_error(errors[shopify_order_id])
+            else:
+                done_events |= event
+        done_events._mark_done()
+
+    def _mark_done(self):
+        self.write({
+            'state': 'done',
+            'error_message': False,
+            'processed_at': fields.Datetime.now(),
+        })
+
+    def _mark_error(self, message):
+        self.write({
+            'state': 'error',
+            'error_message': message,
+            'processed_at': fields.Datetime.now(),
+        })
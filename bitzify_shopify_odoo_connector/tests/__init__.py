@@ -0,0 +1,5 @@
+from . import test_bulk_import
+from . import test_import_benchmark
+from . import test_metrics
+from . import test_order_import
+from . import test_shopify_client
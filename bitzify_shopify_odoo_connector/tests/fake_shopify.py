@@ -0,0 +1,291 @@
+"""Offline stand-in for the Shopify Admin API
+
+Serves synthetic orders from ``orders.json`` with cursor pagination through
+``Link`` headers, ``shop.json``, the call limit header and, on demand, 429
+responses and rejected cursors, on a random port of the loopback interface.
+Only the ``updated_at_min`` filter is applied. GraphQL bulk operations are
+emulated as well, their result being served as a JSONL file.
+"""
+import json
+import re
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BASE_DATE = datetime(2024, 1, 1)
+
+
+def make_order(index, line_count=3, customer_count=20, product_count=50):
+    """Return a synthetic REST order, customers and products being reused"""
+    customer = index % customer_count + 1
+    address = {
+        'name': f'Customer {customer}',
+        'address1': f'{customer} Benchmark Street',
+        'address2': '',
+        'city': 'Amsterdam',
+        'zip': f'{1000 + customer}AB',
+        'phone': f'+3120{customer:07d}',
+        'country_code': 'NL',
+        'province_code': None,
+    }
+    shipping_address = dict(address, address1=f'{customer} Delivery Lane') if customer % 2 else address
+    date = (BASE_DATE + timedelta(minutes=index)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    return {
+        'id': 5000000 + index,
+        'name': f'#B{index + 1}',
+        'email': f'Customer{customer}@Example.com',
+        'financial_status': 'paid' if index % 3 else 'pending',
+        'fulfillment_status': None,
+        'created_at': date,
+        'updated_at': date,
+        'note': '',
+        'customer': {
+            'id': 7000000 + customer,
+            'first_name': 'Customer',
+            'last_name': str(customer),
+            'phone': address['phone'],
+        },
+        'billing_address': address,
+        'shipping_address': shipping_address,
+        'line_items': [
+            {
+                'id': 9000000 + index * line_count + line,
+                'name': f'Benchmark Product {variant}',
+                'sku': f'BENCH-{variant}',
+                'quantity': line + 1,
+                'price': '19.95',
+                'product_id': 8000000 + variant,
+                'variant_id': 8500000 + variant,
+            }
+            for line in range(line_count)
+            for variant in [(index * line_count + line) % product_count + 1]
+        ],
+        'shipping_lines': [{'title': 'Standard', 'price': '4.95'}],
+    }
+
+
+def _gid(resource, legacy_id):
+    return f'gid://shopify/{resource}/{legacy_id}'
+
+
+def _graphql_address(address):
+    if not address:
+        return None
+    return {
+        'name': address['name'],
+        'address1': address['address1'],
+        'address2': address['address2'],
+        'city': address['city'],
+        'zip': address['zip'],
+        'phone': address['phone'],
+        'countryCodeV2': address['country_code'],
+        'provinceCode': address['province_code'],
+    }
+
+
+def bulk_lines(order):
+    """Return the JSONL lines of a REST order in a bulk operation result"""
+    order_gid = _gid('Order', order['id'])
+    customer = order['customer']
+    lines = [{
+        'id': order_gid,
+        'name': order['name'],
+        'email': order['email'],
+        'displayFinancialStatus': order['financial_status'].upper(),
+        'displayFulfillmentStatus': 'UNFULFILLED',
+        'createdAt': order['created_at'],
+        'updatedAt': order['updated_at'],
+        'note': order['note'],
+        'customer': {
+            'id': _gid('Customer', customer['id']),
+            'firstName': customer['first_name'],
+            'lastName': customer['last_name'],
+            'phone': customer['phone'],
+        },
+        'billingAddress': _graphql_address(order['billing_address']),
+        'shippingAddress': _graphql_address(order['shipping_address']),
+    }]
+    for line_item in order['line_items']:
+        lines.append({
+            'id': _gid('LineItem', line_item['id']),
+            'name': line_item['name'],
+            'sku': line_item['sku'],
+            'quantity': line_item['quantity'],
+            'originalUnitPriceSet': {'shopMoney': {'amount': line_item['price']}},
+            'product': {'id': _gid('Product', line_item['product_id'])},
+            'variant': {'id': _gid('ProductVariant', line_item['variant_id'])},
+            '__parentId': order_gid,
+        })
+    for index, shipping_line in enumerate(order['shipping_lines']):
+        lines.append({
+            'id': _gid('ShippingLine', order['id'] * 10 + index),
+            'title': shipping_line['title'],
+            'originalPriceSet': {'shopMoney': {'amount': shipping_line['price']}},
+            '__parentId': order_gid,
+        })
+    return [json.dumps(line) for line in lines]
+
+
+class FakeShopify:
+    """Threaded HTTP server answering like the Admin API of one store
+
+    The attributes below the orders can be changed by tests to make the
+    store throttle, reject cursors or report bulk operations differently.
+    """
+
+    def __init__(self, order_count=100, line_count=3, customer_count=20, product_count=50):
+        self.orders = [
+            make_order(index, line_count, customer_count, product_count)
+            for index in range(order_count)
+        ]
+        # Value of the X-Shopify-Shop-Api-Call-Limit header
+        self.call_limit = '1/40'
+        # Number of next requests answered with a 429, and their Retry-After
+        self.throttled_requests = 0
+        self.retry_after = '0.1'
+        # Answer 400 to any page_info, as Shopify does for expired cursors
+        self.reject_cursors = False
+        # Polls answered RUNNING before the bulk operation completes
+        self.bulk_polls_before_completion = 0
+        self.bulk_operation_found = True
+        self.requests = []
+        self.server = None
+        self.thread = None
+
+    @property
+    def request_count(self):
+        return len(self.requests)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _parse_request(self):
+                url = urlparse(self.path)
+                query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                resource = re.sub(r'^/(admin/api/[^/]+/)?', '', url.path)
+                fake.requests.append((self.command, resource, query))
+                return url, resource, query
+
+            def _is_throttled(self):
+                if not fake.throttled_requests:
+                    return False
+                fake.throttled_requests -= 1
+                self._send_json({'errors': 'Exceeded 2 calls per second'}, status=429, headers={
+                    'Retry-After': fake.retry_after,
+                })
+                return True
+
+            def do_GET(self):
+                url, resource, query = self._parse_request()
+                if resource == 'bulk/orders.jsonl':
+                    self._send_bulk_result()
+                elif self._is_throttled():
+                    return
+                elif resource == 'shop.json':
+                    self._send_json({'shop': {'name': 'Benchmark Store', 'domain': '127.0.0.1'}})
+                elif resource == 'orders.json':
+                    self._send_orders(url.path, query)
+                else:
+                    self._send_json({'errors': 'Not Found'}, status=404)
+
+            def do_POST(self):
+                _url, resource, _query = self._parse_request()
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                if self._is_throttled():
+                    return
+                if resource != 'graphql.json':
+                    self._send_json({'errors': 'Not Found'}, status=404)
+                elif 'bulkOperationRunQuery' in body.get('query', ''):
+                    self._send_json({'data': {'bulkOperationRunQuery': {
+                        'bulkOperation': {'id': 'gid://shopify/BulkOperation/1', 'status': 'CREATED'},
+                        'userErrors': [],
+                    }}})
+                else:
+                    self._send_json({'data': {'node': self._bulk_operation()}})
+
+            def _bulk_operation(self):
+                if not fake.bulk_operation_found:
+                    return None
+                if fake.bulk_polls_before_completion:
+                    fake.bulk_polls_before_completion -= 1
+                    return {'id': 'gid://shopify/BulkOperation/1', 'status': 'RUNNING'}
+                return {
+                    'id': 'gid://shopify/BulkOperation/1',
+                    'status': 'COMPLETED',
+                    'objectCount': len(fake.orders),
+                    'url': f'http://{self.headers["Host"]}/bulk/orders.jsonl' if fake.orders else None,
+                }
+
+            def _send_bulk_result(self):
+                body = ''.join(
+                    f'{line}\n' for order in fake.orders for line in bulk_lines(order)
+                ).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/jsonl')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_orders(self, path, query):
+                limit = int(query.get('limit', 50))
+                if query.get('page_info') and fake.reject_cursors:
+                    self._send_json({'errors': {'page_info': 'Invalid value.'}}, status=400)
+                    return
+                # Orders are sorted by update time, a cursor is the index of
+                # the first order of its page
+                if query.get('page_info'):
+                    offset = int(query['page_info'])
+                else:
+                    updated_at_min = query.get('updated_at_min', '')
+                    offset = next(
+                        (index for index, order in enumerate(fake.orders) if order['updated_at'] >= updated_at_min),
+                        len(fake.orders)
+                    )
+                orders = fake.orders[offset:offset + limit]
+                if query.get('fields'):
+                    fields = query['fields'].split(',')
+                    orders = [{field: order.get(field) for field in fields} for order in orders]
+                    
+                headers = {}
+                if offset + limit < len(fake.orders):
+                    next_query = f'limit={limit}&page_info={offset + limit}'
+                    if query.get('fields'):
+                        next_query += f"&fields={query['fields']}"
+                    headers['Link'] = f'<http://{self.headers["Host"]}{path}?{next_query}>; rel="next"'
+                self._send_json({'orders': orders}, headers=headers)
+
+            def _send_json(self, payload, status=200, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('X-Shopify-Shop-Api-Call-Limit', fake.call_limit)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
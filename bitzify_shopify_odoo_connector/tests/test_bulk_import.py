@@ -0,0 +1,86 @@
+from odoo.exceptions import UserError
+from odoo.tests import TransactionCase, tagged
+
+from .fake_shopify import FakeShopify
+
+
+@tagged('post_install', '-at_install')
+class TestBulkImport(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.shopify = FakeShopify(order_count=5, line_count=2, customer_count=3).start()
+        cls.addClassCleanup(cls.shopify.stop)
+        cls.connector = cls.env['bitzify.shopify.connector'].create({
+            'name': 'Bulk',
+            'shopify_store_url': cls.shopify.url,
+            'api_access_token': 'bulk-token',
+        })
+
+    def setUp(self):
+        super().setUp()
+        self.shopify.requests.clear()
+        self.shopify.bulk_polls_before_completion = 0
+        self.shopify.bulk_operation_found = True
+
+    def _imported_orders(self):
+        return self.env['sale.order'].search([('shopify_connector_id', '=', self.connector.id)])
+
+    def test_import_orders_bulk(self):
+        self.shopify.bulk_polls_before_completion = 2
+        
+        self.assertEqual(self.connector._import_orders_bulk(poll_interval=0), 5)
+        
+        orders = self._imported_orders()
+        self.assertEqual(len(orders), 5)
+        # Two product lines and one shipping line per order
+        self.assertEqual(len(orders.order_line), 15)
+        self.assertFalse(self.connector.bulk_operation_id)
+        self.assertEqual(self.connector.bulk_operation_status, 'COMPLETED')
+        self.assertEqual(self.connector.sync_watermark.strftime('%Y-%m-%dT%H:%M:%SZ'), self.shopify.orders[-1]['updated_at'])
+
+    def test_unknown_operation_is_forgotten(self):
+        self.shopify.bulk_operation_found = False
+        self.connector.bulk_operation_id = 'gid://shopify/BulkOperation/404'
+        
+        with self.assertRaises(UserError):
+            self.connector._check_bulk_import()
+        self.assertFalse(self.connector.bulk_operation_id)
+        # A new backfill can be started
+        self.connector._start_bulk_import()
+        self.assertTrue(self.connector.bulk_operation_id)
+
+    def test_cron_skips_rest_import_during_bulk(self):
+        self.shopify.bulk_polls_before_completion = 1
+        self.connector._start_bulk_import()
+        
+        self.env['bitzify.shopify.connector']._cron_import_connector(self.connector.id)
+        
+        self.assertTrue(self.connector.bulk_operation_id)
+        self.assertFalse([request for request in self.shopify.requests if request[1] == 'orders.json'])
+        self.assertFalse(self._imported_orders())
+
+    def test_start_triggers_cron(self):
+        self.connector._start_bulk_import()
+        
+        self.assertTrue(self.env['ir.cron.trigger'].search([('cron_id', '=', self.connector.import_cron_id.id)]))
+
+    def test_bulk_import_requires_auto_import(self):
+        self.connector.auto_import_orders = False
+        
+        with self.assertRaises(UserError):
+            self.connector._start_bulk_import()
+        self.assertFalse(self.connector.bulk_operation_id)
+        self.assertFalse(self.shopify.requests)
+
+    def test_disabling_auto_import_forgets_bulk(self):
+        self.connector._start_bulk_import()
+        
+        self.connector.auto_import_orders = False
+        
+        self.assertFalse(self.connector.bulk_operation_id)
+        # A new backfill can be started once enabled again
+        self.connector.auto_import_orders = True
+        self.connector._start_bulk_import()
+        self.assertTrue(self.connector.bulk_operation_id)
@@ -0,0 +1,113 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+
+from odoo.tests import HttpCase, TransactionCase, tagged
+
+from .fake_shopify import FakeShopify, make_order
+
+_logger = logging.getLogger(__name__)
+
+# Sizes can be raised locally, e.g. BITZIFY_BENCH_ORDERS=2000
+ORDER_COUNT = int(os.environ.get('BITZIFY_BENCH_ORDERS', 100))
+LINE_COUNT = int(os.environ.get('BITZIFY_BENCH_LINES', 3))
+CUSTOMER_COUNT = int(os.environ.get('BITZIFY_BENCH_CUSTOMERS', 20))
+PRODUCT_COUNT = int(os.environ.get('BITZIFY_BENCH_PRODUCTS', 50))
+
+
+class BenchmarkMixin:
+    """Report throughput and query count of a block importing orders"""
+
+    def _benchmark(self, label, order_count, func):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = self.cr.sql_log_count
+        start = time.perf_counter()
+        result = func()
+        self.env.flush_all()
+        elapsed = time.perf_counter() - start
+        queries = self.cr.sql_log_count - queries
+        _logger.info(
+            "Benchmark %s: %s orders in %.2fs, %.1f orders/s, %.1f queries/order",
+            label, order_count, elapsed, order_count / elapsed, queries / order_count
+        )
+        return result
+
+
+@tagged('post_install', '-at_install', 'bitzify_benchmark')
+class TestImportBenchmark(BenchmarkMixin, TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.shopify = FakeShopify(ORDER_COUNT, LINE_COUNT, CUSTOMER_COUNT, PRODUCT_COUNT).start()
+        cls.addClassCleanup(cls.shopify.stop)
+        cls.connector = cls.env['bitzify.shopify.connector'].create({
+            'name': 'Benchmark',
+            'shopify_store_url': cls.shopify.url,
+            'api_access_token': 'benchmark-token',
+            'auto_import_orders': False,
+        })
+
+    def test_import_orders(self):
+        imported_count = self._benchmark('import_orders', ORDER_COUNT, self.connector._import_orders)
+        self.assertEqual(imported_count, ORDER_COUNT)
+        self.assertEqual(
+            self.env['sale.order'].search_count([('shopify_connector_id', '=', self.connector.id)]),
+            ORDER_COUNT
+        )
+        
+        # Unchanged orders served again are skipped
+        self.connector.sync_watermark = False
+        self._benchmark('import_orders (re-sync)', ORDER_COUNT, self.connector._import_orders)
+        self.assertEqual(
+            self.env['sale.order'].search_count([('shopify_connector_id', '=', self.connector.id)]),
+            ORDER_COUNT
+        )
+
+
+@tagged('post_install', '-at_install', 'bitzify_benchmark')
+class TestWebhookBenchmark(BenchmarkMixin, HttpCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connector = self.env['bitzify.shopify.connector'].create({
+            'name': 'Benchmark Webhooks',
+            'shopify_store_url': 'bitzify-benchmark.myshopify.com',
+            'api_access_token': 'benchmark-token',
+            'webhook_secret': 'benchmark-secret',
+            'auto_import_orders': False,
+        })
+
+    def _post_webhook(self, topic, payload):
+        body = json.dumps(payload).encode()
+        signature = base64.b64encode(hmac.new(b'benchmark-secret', body, hashlib.sha256).digest()).decode()
+        return self.url_open('/bitzify/shopify/webhook', data=body, headers={
+            'Content-Type': 'application/json',
+            'X-Shopify-Topic': topic,
+            'X-Shopify-Shop-Domain': self.connector.shopify_shop_domain,
+            'X-Shopify-Hmac-Sha256': signature,
+            'X-Shopify-Webhook-Id': f"benchmark-{topic}-{payload['id']}",
+        })
+
+    def test_webhook_orders(self):
+        orders = [
+            make_order(index, LINE_COUNT, CUSTOMER_COUNT, PRODUCT_COUNT)
+            for index in range(ORDER_COUNT)
+        ]
+        
+        def receive():
+            for order in orders:
+                response = self._post_webhook('orders/create', order)
+                self.assertEqual(response.json().get('status'), 'queued')
+        self._benchmark('webhook receipt', ORDER_COUNT, receive)
+        
+        self._benchmark('webhook processing', ORDER_COUNT, self.env['bitzify.shopify.webhook.event']._cron_process_events)
+        self.assertEqual(
+            self.env['sale.order'].search_count([('shopify_connector_id', '=', self.connector.id)]),
+            ORDER_COUNT
+        )
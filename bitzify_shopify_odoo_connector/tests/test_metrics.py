@@ -0,0 +1,62 @@
+import json
+import os
+import socket
+import subprocess
+import tempfile
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from ..tools import metrics
+
+SHOP = 'metrics-test.myshopify.com'
+
+
+@tagged('post_install', '-at_install')
+class TestMetrics(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        patcher = patch.object(metrics, '_metrics_dir', return_value=self.directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _write_process_file(self, pid, data):
+        with open(os.path.join(self.directory, f'{socket.gethostname()}-{pid}-test.json'), 'w') as metrics_file:
+            json.dump(data, metrics_file)
+
+    def _dead_pid(self):
+        process = subprocess.Popen(['true'])
+        process.wait()
+        return process.pid
+
+    def test_render_merges_processes(self):
+        metrics.ORDERS_PROCESSED.inc(2, shop=SHOP, outcome='created')
+        metrics.QUEUE_DEPTH.set(4, shop=SHOP)
+        # A cron worker, which never serves the metrics itself
+        self._write_process_file(os.getppid(), {
+            metrics.ORDERS_PROCESSED.name: [[[SHOP, 'created'], 3]],
+            metrics.QUEUE_DEPTH.name: [[[SHOP], [9, 1.0]]],
+        })
+
+        output = metrics.render()
+
+        created = metrics.ORDERS_PROCESSED._series[(SHOP, 'created')]
+        self.assertIn(f'bitzify_shopify_orders_processed_total{{shop="{SHOP}",outcome="created"}} {float(created + 3)}', output)
+        # The value set last wins
+        self.assertIn(f'bitzify_shopify_webhook_queue_depth{{shop="{SHOP}"}} 4.0', output)
+
+    def test_dead_processes_are_archived(self):
+        self._write_process_file(self._dead_pid(), {
+            metrics.ORDERS_PROCESSED.name: [[[SHOP, 'failed'], 4]],
+            metrics.ORDER_BATCH_DURATION.name: [[[SHOP], [[1] * len(metrics.ORDER_BATCH_DURATION.buckets), 0.001]]],
+        })
+
+        for _scrape in range(2):
+            series = metrics.collect()
+            self.assertEqual(series[metrics.ORDERS_PROCESSED.name][(SHOP, 'failed')], 4)
+            self.assertEqual(series[metrics.ORDER_BATCH_DURATION.name][(SHOP,)][0][-1], 1)
+        self.assertFalse([name for name in os.listdir(self.directory) if name.endswith('-test.json')])
@@ -0,0 +1,212 @@
+import json
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import TransactionCase, tagged
+
+from ..tools.shopify_client import parse_datetime
+from ..tools.sync_stats import SyncStats
+from .fake_shopify import FakeShopify, make_order
+
+
+@tagged('post_install', '-at_install')
+class TestOrderImport(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.shopify = FakeShopify(order_count=5, line_count=1, customer_count=2).start()
+        cls.addClassCleanup(cls.shopify.stop)
+        cls.connector = cls.env['bitzify.shopify.connector'].create({
+            'name': 'Import',
+            'shopify_store_url': cls.shopify.url,
+            'api_access_token': 'import-token',
+            'auto_import_orders': False,
+        })
+
+    def setUp(self):
+        super().setUp()
+        self.shopify.requests.clear()
+        self.shopify.reject_cursors = False
+
+    def _imported_order_ids(self):
+        return set(self.env['sale.order'].search([
+            ('shopify_connector_id', '=', self.connector.id),
+        ]).mapped('shopify_order_id'))
+
+    def _order_requests(self):
+        return [query for _method, resource, query in self.shopify.requests if resource == 'orders.json']
+
+    def test_resume_from_checkpoint(self):
+        self.connector.write({
+            'import_checkpoint_cursor': '3',
+            'import_checkpoint_updated_at': parse_datetime(self.shopify.orders[2]['updated_at']),
+        })
+
+        self.assertEqual(self.connector._import_orders(), 2)
+
+        self.assertEqual(self._order_requests()[0].get('page_info'), '3')
+        self.assertEqual(self._imported_order_ids(), {str(order['id']) for order in self.shopify.orders[3:]})
+        self.assertFalse(self.connector.import_checkpoint_cursor)
+        self.assertFalse(self.connector.import_checkpoint_updated_at)
+
+    def test_expired_cursor_falls_back_to_checkpoint(self):
+        self.shopify.reject_cursors = True
+        self.connector.write({
+            'import_checkpoint_cursor': 'expired',
+            'import_checkpoint_updated_at': parse_datetime(self.shopify.orders[3]['updated_at']),
+        })
+
+        self.assertEqual(self.connector._import_orders(), 2)
+
+        rejected, fallback = self._order_requests()
+        self.assertEqual(rejected.get('page_info'), 'expired')
+        self.assertNotIn('page_info', fallback)
+        self.assertEqual(fallback['updated_at_min'], self.shopify.orders[3]['updated_at'])
+        self.assertEqual(self._imported_order_ids(), {str(order['id']) for order in self.shopify.orders[3:]})
+
+    def test_mixed_case_emails_share_customer(self):
+        orders_data = [make_order(index) for index in (100, 101, 102)]
+        for order_data, email in zip(orders_data, ('Jane.Doe@Example.COM', 'jane.doe@example.com', 'JANE.DOE@example.com')):
+            order_data.update(email=email, customer=None)
+
+        # Within a page, then across pages
+        self.connector._import_order_page(orders_data[:2])
+        self.connector._import_order_page(orders_data[2:])
+
+        orders = self.env['sale.order'].search([('shopify_order_id', 'in', [str(order['id']) for order in orders_data])])
+        self.assertEqual(len(orders), 3)
+        self.assertEqual(len(orders.partner_id), 1)
+        self.assertEqual(self.env['res.partner'].search_count([('email_normalized', '=', 'jane.doe@example.com')]), 1)
+
+    def test_delivery_address_is_reused(self):
+        # Orders of the same customer, shipped away from the billing address
+        orders_data = [make_order(index, customer_count=2) for index in (200, 202, 204)]
+        shipping_address = orders_data[0]['shipping_address']
+        self.assertNotEqual(shipping_address['address1'], orders_data[0]['billing_address']['address1'])
+        orders_data[1]['shipping_address'] = dict(shipping_address, address1=f"  {shipping_address['address1'].upper()} ")
+        orders_data[2]['shipping_address'] = dict(shipping_address, address1='1 Other Lane')
+
+        self.connector._import_order_page(orders_data[:1])
+        self.connector._import_order_page(orders_data[1:])
+
+        orders = {
+            order.shopify_order_id: order
+            for order in self.env['sale.order'].search([('shopify_order_id', 'in', [str(order['id']) for order in orders_data])])
+        }
+        first, same, other = (orders[str(order_data['id'])] for order_data in orders_data)
+        self.assertEqual(same.partner_shipping_id, first.partner_shipping_id)
+        self.assertNotEqual(other.partner_shipping_id, first.partner_shipping_id)
+        self.assertEqual(len(first.partner_id.child_ids.filtered(lambda child: child.type == 'delivery')), 2)
+
+    def test_duplicate_webhook_ids(self):
+        Event = self.env['bitzify.shopify.webhook.event']
+        payload = json.dumps(make_order(300))
+
+        event = Event._enqueue(self.connector, 'orders/create', payload, webhook_id='delivery-300')
+        redelivery = Event._enqueue(self.connector, 'orders/create', payload, webhook_id='delivery-300')
+
+        self.assertTrue(event)
+        self.assertFalse(redelivery)
+        self.assertEqual(Event.search_count([('webhook_id', '=', 'delivery-300')]), 1)
+
+        event._process()
+        self.assertEqual(event.state, 'done')
+        self.assertEqual(self.env['sale.order'].search_count([('shopify_order_id', '=', '5000300')]), 1)
+
+    def test_backfill_skips_duplicate_legacy_orders(self):
+        Connector = self.env['bitzify.shopify.connector']
+        (Connector.search([]) - self.connector).unlink()
+        partner = self.env['res.partner'].create({'name': 'Legacy Customer'})
+        # Created twice by concurrent webhooks, before connector ownership
+        legacy_orders = self.env['sale.order'].create([{
+            'partner_id': partner.id,
+            'is_shopify_order': True,
+            'shopify_order_id': '4000001',
+        } for _copy in range(2)])
+        single_order = self.env['sale.order'].create({
+            'partner_id': partner.id,
+            'is_shopify_order': True,
+            'shopify_order_id': '4000002',
+        })
+
+        with self.assertLogs('odoo.addons.bitzify_shopify_odoo_connector.models.shopify_connector', 'WARNING') as logs:
+            Connector._backfill_order_connectors()
+
+        self.assertEqual(legacy_orders[0].shopify_connector_id, self.connector)
+        self.assertFalse(legacy_orders[1].shopify_connector_id)
+        self.assertEqual(single_order.shopify_connector_id, self.connector)
+        self.assertTrue([line for line in logs.output if legacy_orders[1].name in line])
+
+    def test_paid_order_confirmation_failure(self):
+        orders_data = [make_order(index) for index in (401, 404, 407)]
+        for order_data in orders_data:
+            order_data['financial_status'] = 'paid'
+        SaleOrder = self.registry['sale.order']
+        action_confirm = SaleOrder.action_confirm
+
+        def refuse_confirmation(orders):
+            if '5000404' in orders.mapped('shopify_order_id'):
+                raise UserError('Credit limit exceeded')
+            return action_confirm(orders)
+
+        # The batch fails, then only the blocked order is left in draft
+        with patch.object(SaleOrder, 'action_confirm', refuse_confirmation):
+            self.connector._import_order_page(orders_data)
+
+        orders = self.env['sale.order'].search([('shopify_order_id', 'in', ['5000401', '5000404', '5000407'])])
+        blocked = orders.filtered(lambda order: order.shopify_order_id == '5000404')
+        self.assertEqual((orders - blocked).mapped('state'), ['sale', 'sale'])
+        self.assertEqual(blocked.state, 'draft')
+        self.assertIn('Credit limit exceeded', blocked.shopify_confirmation_error)
+
+        # The failure is not retried until Shopify changes the order
+        stats = SyncStats()
+        self.connector._import_order_page(orders_data, stats=stats)
+        self.assertEqual(stats.counts['skipped'], 3)
+        self.assertEqual(blocked.state, 'draft')
+
+        # Confirming it by hand clears the error
+        blocked.action_confirm()
+        self.assertEqual(blocked.state, 'sale')
+        self.assertFalse(blocked.shopify_confirmation_error)
+
+    def test_unchanged_orders_are_skipped(self):
+        orders_data = [make_order(index) for index in (500, 501)]
+        for order_data in orders_data:
+            order_data['financial_status'] = 'pending'
+        self.connector._import_order_page(orders_data)
+        SaleOrder = self.registry['sale.order']
+
+        stats = SyncStats()
+        with patch.object(SaleOrder, 'write', autospec=True, side_effect=SaleOrder.write) as write:
+            self.connector._import_order_page(orders_data, stats=stats)
+
+        self.assertEqual(stats.counts['skipped'], 2)
+        self.assertEqual(stats.counts['updated'], 0)
+        write.assert_not_called()
+
+        # A mapped field changing is an update
+        orders_data[0]['fulfillment_status'] = 'fulfilled'
+        stats = SyncStats()
+        self.connector._import_order_page(orders_data, stats=stats)
+        self.assertEqual((stats.counts['skipped'], stats.counts['updated']), (1, 1))
+
+    def test_known_variants_are_read_from_product_map(self):
+        Connector = self.registry['bitzify.shopify.connector']
+        ProductMap = self.env['bitzify.shopify.product.map']
+        self.connector._import_order_page([make_order(600)])
+        product_count = self.env['product.product'].search_count([])
+        map_count = ProductMap.search_count([('connector_id', '=', self.connector.id)])
+        self.assertEqual(map_count, 3)
+
+        # Another order of the same three variants
+        with patch.object(Connector, '_find_product_for_line_item', autospec=True,
+                          side_effect=Connector._find_product_for_line_item) as find_product:
+            self.connector._import_order_page([make_order(650)])
+
+        find_product.assert_not_called()
+        self.assertEqual(self.env['product.product'].search_count([]), product_count)
+        self.assertEqual(ProductMap.search_count([('connector_id', '=', self.connector.id)]), map_count)
+        first, second = self.env['sale.order'].search([('shopify_order_id', 'in', ['5000600', '5000650'])], order='id')
+        self.assertEqual(second.order_line.product_id, first.order_line.product_id)
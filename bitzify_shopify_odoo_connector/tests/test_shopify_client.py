@@ -0,0 +1,57 @@
+import json
+import time
+
+from odoo.tests import TransactionCase, tagged
+
+from ..tools.shopify_client import ShopifyClient, ShopifyError, iter_json_array
+from .fake_shopify import FakeShopify, make_order
+
+
+@tagged('post_install', '-at_install')
+class TestShopifyClient(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.shopify = FakeShopify(order_count=3, line_count=1).start()
+        cls.addClassCleanup(cls.shopify.stop)
+
+    def setUp(self):
+        super().setUp()
+        self.shopify.requests.clear()
+
+    def test_throttled_request_waits_retry_after(self):
+        client = ShopifyClient(self.shopify.url, 'client-token', '2024-01')
+        self.shopify.throttled_requests = 1
+        self.shopify.retry_after = '0.5'
+
+        start = time.monotonic()
+        response = client.get('shop.json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.shopify.request_count, 2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.5)
+        # The store is assumed to leak slower until responses succeed again
+        self.assertLess(client.throttle.rate_factor, 1.0)
+
+    def test_iter_json_array_across_chunk_splits(self):
+        orders = [make_order(index) for index in range(3)]
+        orders[1]['note'] = 'Ünïcode ✓, "quotes", [brackets] and {braces}'
+        document = json.dumps({'meta': {'orders_count': 3}, 'orders': orders}, ensure_ascii=False).encode()
+
+        # Every split point, multi-byte characters and the key included
+        for size in (1, 2, 3, 7, 64, len(document)):
+            chunks = [document[index:index + size] for index in range(0, len(document), size)]
+            self.assertEqual(list(iter_json_array(chunks, 'orders')), orders, f'chunks of {size} bytes')
+
+    def test_iter_json_array_empty(self):
+        self.assertEqual(list(iter_json_array([b'{"orders"', b': []}'], 'orders')), [])
+
+    def test_iter_json_array_truncated(self):
+        items = iter_json_array([b'{"orders":[{"a":1},{"b":'], 'orders')
+        self.assertEqual(next(items), {'a': 1})
+        with self.assertRaises(ShopifyError):
+            next(items)
+        
+        with self.assertRaises(ShopifyError):
+            list(iter_json_array([b'{"errors": "Not Found"}'], 'orders'))
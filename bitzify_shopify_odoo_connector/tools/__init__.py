@@ -0,0 +1,5 @@
+from . import metrics
+from . import shopify_client
+from . import shopify_fields
+from . import shopify_bulk
+from . import sync_stats
@@ -0,0 +1,365 @@
+"""Metrics of the connector, exposed in Prometheus text format
+
+Every Odoo process records its metrics in memory and writes them to its own
+file under ``<data_dir>/bitzify_shopify_metrics``, at most once every
+``FLUSH_INTERVAL`` seconds. A scrape merges the files of every process of
+the server, like the multiprocess mode of prometheus_client: counters and
+histograms are summed, gauges keep the value set last. The files of
+processes that exited are folded into an archive, so their counts are kept
+without files piling up. The database is never hit.
+"""
+import abc
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from odoo.tools import config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FLUSH_INTERVAL = 1.0
+ARCHIVE_PREFIX = 'archive-'
+
+_registry = []
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_flush_timer = None
+# Process owning the series, and a token telling reused pids apart
+_pid = None
+_token = None
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{%s}' % ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric(abc.ABC):
+    """A named metric holding one series per combination of label values"""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name] or '') for name in self.labelnames)
+
+    def _update(self, labels, update):
+        """Replace the value of a series by ``update(current value)``"""
+        key = self._key(labels)
+        with _lock:
+            _check_fork()
+            self._series[key] = update(self._series.get(key))
+            _schedule_flush()
+
+    @abc.abstractmethod
+    def _merge(self, current, value):
+        """Combine the values of a series recorded by two processes"""
+
+    def _render_series(self, key, value):
+        yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+
+    def render(self, series):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.type}'
+        for key, value in sorted(series.items()):
+            yield from self._render_series(key, value)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, value=1, **labels):
+        self._update(labels, lambda current: (current or 0) + value)
+
+    def _merge(self, current, value):
+        return (current or 0) + value
+
+
+class Gauge(Metric):
+    """A value set at a point in time, the latest one wins across processes"""
+
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        self._update(labels, lambda current: (value, time.time()))
+
+    def _merge(self, current, value):
+        if current is None or value[1] >= current[1]:
+            return value
+        return current
+
+    def _render_series(self, key, value):
+        yield from super()._render_series(key, value[0])
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        def update(current):
+            counts, total = current or ([0] * len(self.buckets), 0.0)
+            return [count + (value <= bound) for bound, count in zip(self.buckets, counts)], total + value
+        self._update(labels, update)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _merge(self, current, value):
+        counts, total = value
+        if len(counts) != len(self.buckets):
+            # Recorded with other buckets by a previous version
+            return current
+        if current is None:
+            return list(counts), total
+        return [a + b for a, b in zip(current[0], counts)], current[1] + total
+
+    def _render_series(self, key, value):
+        counts, total = value
+        labelnames = self.labelnames + ('le',)
+        for bound, count in zip(self.buckets, counts):
+            yield f'{self.name}_bucket{_format_labels(labelnames, key + (_format_value(bound),))} {count}'
+        yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}'
+        yield f'{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}'
+
+
+def _metrics_dir():
+    return os.path.join(config['data_dir'], 'bitzify_shopify_metrics')
+
+
+def _check_fork():
+    """Start afresh in a forked worker, the series inherited are the parent's"""
+    global _pid, _token, _flush_timer
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        _token = uuid.uuid4().hex[:8]
+        _flush_timer = None
+        for metric in _registry:
+            metric._series.clear()
+
+
+def _schedule_flush():
+    global _flush_timer
+    if _flush_timer is None:
+        _flush_timer = threading.Timer(FLUSH_INTERVAL, flush)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def _process_file_name():
+    return f'{socket.gethostname()}-{_pid}-{_token}.json'
+
+
+def _is_alive(pid):
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as metrics_file:
+            return json.load(metrics_file)
+    except (OSError, ValueError):
+        # Archived meanwhile
+        return {}
+
+
+def _write(path, data):
+    """Replace a file atomically, readers never see it half written"""
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as metrics_file:
+        json.dump(data, metrics_file)
+    os.replace(tmp_path, path)
+
+
+def _dump(merged):
+    return {name: [[list(key), value] for key, value in series.items()] for name, series in merged.items()}
+
+
+def _merge_into(merged, data):
+    """Merge series dumped by a process into ``{name: {key: value}}``"""
+    metrics = {metric.name: metric for metric in _registry}
+    for name, series in data.items():
+        metric = metrics.get(name)
+        if not metric:
+            continue
+        target = merged.setdefault(name, {})
+        for key, value in series:
+            if len(key) != len(metric.labelnames):
+                continue
+            key = tuple(key)
+            target[key] = metric._merge(target.get(key), value)
+    return merged
+
+
+@contextmanager
+def _directory_lock(directory):
+    """Serialize the scrapes of the server, which may archive files"""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _archive_dead_processes(directory):
+    """Fold the files of the processes of this host that exited into its archive"""
+    hostname = socket.gethostname()
+    dead_paths = []
+    for file_name in os.listdir(directory):
+        if not file_name.endswith('.json') or file_name.startswith(ARCHIVE_PREFIX):
+            continue
+        try:
+            host, pid, _token = file_name[:-len('.json')].rsplit('-', 2)
+            pid = int(pid)
+        except ValueError:
+            continue
+        if host == hostname and not _is_alive(pid):
+            dead_paths.append(os.path.join(directory, file_name))
+    if not dead_paths:
+        return
+
+    archive_path = os.path.join(directory, f'{ARCHIVE_PREFIX}{hostname}.json')
+    archive = _merge_into({}, _read(archive_path))
+    for path in dead_paths:
+        _merge_into(archive, _read(path))
+    _write(archive_path, _dump(archive))
+    for path in dead_paths:
+        os.unlink(path)
+
+
+def flush():
+    """Write the series of this process to its file"""
+    global _flush_timer
+    with _flush_lock:
+        with _lock:
+            _check_fork()
+            _flush_timer = None
+            data = {metric.name: metric._series.copy() for metric in _registry if metric._series}
+            file_name = _process_file_name()
+        if not data:
+            return
+        directory = _metrics_dir()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            _write(os.path.join(directory, file_name), _dump(data))
+        except OSError as e:
+            _logger.warning(f"Cannot write the Shopify connector metrics: {e}")
+
+
+atexit.register(flush)
+
+
+def collect():
+    """Return the series of every process of the server, as ``{name: {key: value}}``"""
+    flush()
+    directory = _metrics_dir()
+    os.makedirs(directory, exist_ok=True)
+    merged = {}
+    with _directory_lock(directory):
+        _archive_dead_processes(directory)
+        for file_name in os.listdir(directory):
+            if file_name.endswith('.json'):
+                _merge_into(merged, _read(os.path.join(directory, file_name)))
+    return merged
+
+
+def render():
+    """Return every metric in Prometheus text exposition format"""
+    merged = collect()
+    return '\n'.join(
+        line for metric in _registry for line in metric.render(merged.get(metric.name, {}))
+    ) + '\n'
+
+
+WEBHOOKS_RECEIVED = Counter(
+    'bitzify_shopify_webhooks_received_total',
+    'Shopify webhook deliveries received, by outcome',
+    ('shop', 'topic', 'status'),
+)
+WEBHOOK_DURATION = Histogram(
+    'bitzify_shopify_webhook_duration_seconds',
+    'Time taken to answer a Shopify webhook delivery',
+    ('shop',),
+)
+HMAC_DURATION = Histogram(
+    'bitzify_shopify_hmac_verification_seconds',
+    'Time taken to verify the HMAC signature of a webhook delivery',
+    ('shop',),
+)
+ORDERS_PROCESSED = Counter(
+    'bitzify_shopify_orders_processed_total',
+    'Shopify orders imported, by outcome',
+    ('shop', 'outcome'),
+)
+ORDER_BATCH_DURATION = Histogram(
+    'bitzify_shopify_order_batch_duration_seconds',
+    'Time taken to import a batch of Shopify orders',
+    ('shop',),
+)
+API_REQUESTS = Counter(
+    'bitzify_shopify_api_requests_total',
+    'Shopify Admin API calls, by response status code',
+    ('shop', 'status'),
+)
+API_DURATION = Histogram(
+    'bitzify_shopify_api_request_duration_seconds',
+    'Time until the response headers of a Shopify Admin API call',
+    ('shop',),
+)
+QUEUE_DEPTH = Gauge(
+    'bitzify_shopify_webhook_queue_depth',
+    'Webhook events waiting to be processed, as of the last queue run',
+    ('shop',),
+)
@@ -0,0 +1,175 @@
+"""Shopify GraphQL bulk operations used to backfill orders
+
+A bulk operation runs the order query on Shopify's side and publishes the
+result as a JSONL file, one object per line. Nested connections (line items,
+shipping lines) are flattened into their own lines pointing back to their
+order through ``__parentId``. The helpers below stream that file back into
+orders shaped like the REST ``orders.json`` payload, so the regular import
+pipeline can process them.
+"""
+import json
+import logging
+
+from .shopify_fields import ORDER_FIELDS, graphql_order_selection
+
+_logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('COMPLETED', 'FAILED', 'CANCELED', 'EXPIRED')
+
+ORDERS_QUERY = '''
+{
+  orders%(filter)s {
+    edges {
+      node {
+        %(selection)s
+      }
+    }
+  }
+}
+'''
+
+RUN_QUERY_MUTATION = '''
+mutation bulkOperationRunQuery($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+'''
+
+OPERATION_QUERY = '''
+query bulkOperation($id: ID!) {
+  node(id: $id) {
+    ... on BulkOperation { id status errorCode objectCount url }
+  }
+}
+'''
+
+FULFILLMENT_STATUSES = {
+    'FULFILLED': 'fulfilled',
+    'PARTIALLY_FULFILLED': 'partial',
+    'RESTOCKED': 'restocked',
+}
+
+
+def build_orders_query(created_at_min=None):
+    """Return the bulk orders query, optionally limited to recent orders"""
+    order_filter = ''
+    if created_at_min:
+        search = f"created_at:>='{created_at_min:%Y-%m-%dT%H:%M:%S}Z'"
+        order_filter = f'(query: {json.dumps(search)})'
+    return ORDERS_QUERY % {'filter': order_filter, 'selection': graphql_order_selection()}
+
+
+def legacy_id(gid):
+    """Return the numeric id of a GraphQL global id"""
+    if not gid:
+        return None
+    return int(gid.rsplit('/', 1)[-1])
+
+
+def _gid_type(gid):
+    # gid://shopify/<Type>/<id>
+    return gid.split('/')[-2] if gid else None
+
+
+def _amount(money_set):
+    return ((money_set or {}).get('shopMoney') or {}).get('amount', 0)
+
+
+def _address_to_rest(address):
+    if not address:
+        return None
+    return {
+        'name': address.get('name'),
+        'address1': address.get('address1'),
+        'address2': address.get('address2'),
+        'city': address.get('city'),
+        'zip': address.get('zip'),
+        'phone': address.get('phone'),
+        'country_code': address.get('countryCodeV2'),
+        'province_code': address.get('provinceCode'),
+    }
+
+
+def _customer_to_rest(customer):
+    if not customer:
+        return {}
+    return {
+        'id': legacy_id(customer.get('id')),
+        'first_name': customer.get('firstName') or '',
+        'last_name': customer.get('lastName') or '',
+        'phone': customer.get('phone'),
+    }
+
+
+def _line_item_to_rest(line_item):
+    return {
+        'id': legacy_id(line_item['id']),
+        'name': line_item.get('name'),
+        'sku': line_item.get('sku'),
+        'quantity': line_item.get('quantity', 1),
+        'price': _amount(line_item.get('originalUnitPriceSet')),
+        'product_id': legacy_id((line_item.get('product') or {}).get('id')),
+        'variant_id': legacy_id((line_item.get('variant') or {}).get('id')),
+    }
+
+
+def _shipping_line_to_rest(shipping_line):
+    return {
+        'title': shipping_line.get('title'),
+        'price': _amount(shipping_line.get('originalPriceSet')),
+    }
+
+
+# Conversions of GraphQL values to their REST counterpart, by REST field
+FIELD_CONVERTERS = {
+    'id': legacy_id,
+    'financial_status': lambda status: (status or 'pending').lower(),
+    'fulfillment_status': FULFILLMENT_STATUSES.get,
+    'customer': _customer_to_rest,
+    'billing_address': lambda address: _address_to_rest(address) or {},
+    'shipping_address': _address_to_rest,
+}
+
+
+def order_to_rest(order, line_items, shipping_lines):
+    """Convert a bulk order and its children to the REST order payload shape"""
+    rest_order = {
+        'line_items': [_line_item_to_rest(line_item) for line_item in line_items],
+        'shipping_lines': [_shipping_line_to_rest(shipping_line) for shipping_line in shipping_lines],
+    }
+    for rest_field, graphql_field, _selection in ORDER_FIELDS:
+        if rest_field in rest_order:
+            continue
+        value = order.get(graphql_field)
+        convert = FIELD_CONVERTERS.get(rest_field)
+        rest_order[rest_field] = convert(value) if convert else value
+    return rest_order
+
+
+def iter_bulk_orders(lines):
+    """Reassemble REST-shaped orders from the JSONL lines of a bulk result
+
+    Children are written right after their order, so only the order being
+    assembled is held in memory whatever the size of the file.
+    """
+    current = None
+    for raw_line in lines:
+        if not raw_line:
+            continue
+        node = json.loads(raw_line)
+        parent_id = node.get('__parentId')
+        if not parent_id:
+            if current:
+                yield order_to_rest(*current)
+            current = (node, [], [])
+        elif current and parent_id == current[0]['id']:
+            if _gid_type(node.get('id')) == 'ShippingLine':
+                current[2].append(node)
+            else:
+                current[1].append(node)
+        else:
+            _logger.warning("Skipping bulk result line detached from its order %s", parent_id)
+    if current:
+        yield order_to_rest(*current)
@@ -0,0 +1,377 @@
+"""Shared HTTP client for the Shopify Admin API
+
+Sessions are pooled per store and access token for the lifetime of the
+worker process, so consecutive calls reuse the same keep-alive connections
+instead of opening a new TLS connection per request.
+"""
+import codecs
+import contextlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 3
+POOL_MAXSIZE = 4
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Shopify REST rate limiting: a bucket of 40 calls leaking 2 calls per
+# second on standard plans, scaled up together on Plus plans.
+DEFAULT_BUCKET_SIZE = 40
+BUCKET_DRAIN_SECONDS = 20
+BUCKET_HEADROOM = 2
+MAX_THROTTLE_RETRIES = 5
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_throttles = {}
+_throttles_lock = threading.Lock()
+
+
+class ShopifyError(Exception):
+    """Error reported by the Shopify API"""
+
+
+class JitterRetry(Retry):
+    """Retry policy adding random jitter to the exponential backoff"""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return backoff
+        return random.uniform(backoff / 2, backoff * 1.5)
+
+
+def parse_datetime(value):
+    """Parse a Shopify ISO 8601 timestamp into a naive UTC datetime"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def format_datetime(value):
+    """Format a naive UTC datetime for Shopify query parameters"""
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def get_store_base_url(store_url):
+    """Return the base URL of a store, defaulting to HTTPS"""
+    store_url = store_url.strip().rstrip('/')
+    if '://' in store_url:
+        return store_url
+    return f"https://{store_url}"
+
+
+def _build_session(access_token, max_retries):
+    """Create a keep-alive session retrying 5xx responses and connection errors"""
+    retry = JitterRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        status_forcelist=(500, 502, 503, 504),
+        backoff_factor=0.5,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'X-Shopify-Access-Token': access_token,
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+    })
+    return session
+
+
+def get_session(base_url, access_token, max_retries=DEFAULT_MAX_RETRIES):
+    """Return the pooled session of a store, creating it on first use"""
+    key = (base_url, access_token, max_retries)
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _sessions[key] = _build_session(access_token, max_retries)
+    return session
+
+
+def drop_sessions(store_url):
+    """Close and forget every pooled session of a store"""
+    base_url = get_store_base_url(store_url)
+    with _sessions_lock:
+        for key in [key for key in _sessions if key[0] == base_url]:
+            _sessions.pop(key).close()
+
+
+class LeakyBucketThrottle:
+    """Client-side mirror of the Shopify call bucket of one store
+
+    The fill level and size come from the X-Shopify-Shop-Api-Call-Limit
+    header of each response and leak in between at the plan's rate, so
+    requests are paced to stay just under the limit. A 429 blocks the store
+    for Retry-After seconds and slows the assumed leak rate down, which then
+    recovers gradually while responses succeed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.capacity = DEFAULT_BUCKET_SIZE
+        self.level = 0.0
+        self.rate_factor = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    @property
+    def leak_rate(self):
+        return self.capacity / BUCKET_DRAIN_SECONDS * self.rate_factor
+
+    def _leak(self, now):
+        self.level = max(0.0, self.level - (now - self.updated) * self.leak_rate)
+        self.updated = now
+
+    def acquire(self):
+        """Wait until a call fits in the bucket, then account for it"""
+        with self._lock:
+            now = time.monotonic()
+            self._leak(now)
+            delay = max(0.0, self.blocked_until - now)
+            overflow = self.level + 1 - (self.capacity - BUCKET_HEADROOM)
+            if overflow > 0:
+                delay = max(delay, overflow / self.leak_rate)
+            self.level += 1
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def update(self, response):
+        """Resynchronize the bucket with the call limit reported by Shopify"""
+        call_limit = response.headers.get('X-Shopify-Shop-Api-Call-Limit', '')
+        used, _sep, capacity = call_limit.partition('/')
+        with self._lock:
+            if used.isdigit() and capacity.isdigit():
+                self.capacity = int(capacity)
+                self.level = float(used)
+                self.updated = time.monotonic()
+            if response.status_code != 429:
+                self.rate_factor = min(1.0, self.rate_factor + 0.05)
+
+    def backoff(self, retry_after, attempt):
+        """Block the store after a 429 and return the delay applied"""
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = min(2 ** attempt, 30) * random.uniform(0.5, 1.5)
+        with self._lock:
+            now = time.monotonic()
+            self.blocked_until = max(self.blocked_until, now + delay)
+            self.level = float(self.capacity)
+            self.updated = now
+            self.rate_factor = max(0.25, self.rate_factor * 0.5)
+        return delay
+
+
+def get_throttle(base_url):
+    """Return the throttle shared by every client of a store"""
+    throttle = _throttles.get(base_url)
+    if throttle is None:
+        with _throttles_lock:
+            throttle = _throttles.setdefault(base_url, LeakyBucketThrottle())
+    return throttle
+
+
+def iter_json_array(chunks, key):
+    """Yield the items of the ``key`` array of a JSON object streamed in chunks
+
+    Items are decoded one at a time as soon as they are complete, so memory
+    stays bounded by the largest item instead of the whole document. Raises
+    ``ShopifyError`` if the document ends before the array does.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    marker = f'"{key}"'
+    buffer = ''
+    in_array = False
+
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        if not in_array:
+            start = buffer.find(marker)
+            bracket = buffer.find('[', start + len(marker)) if start != -1 else -1
+            if bracket == -1:
+                # Keep enough to match a marker split across chunks
+                buffer = buffer[-(len(marker) + 64):]
+                continue
+            buffer = buffer[bracket + 1:]
+            in_array = True
+
+        while True:
+            buffer = buffer.lstrip(' \t\r\n,')
+            if not buffer:
+                break
+            if buffer[0] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                # Item not complete yet, wait for the next chunk
+                break
+            yield item
+            buffer = buffer[end:]
+            
+    if not in_array:
+        raise ShopifyError(f'No "{key}" array in the response')
+    raise ShopifyError(f'Response truncated inside the "{key}" array')
+
+
+class ShopifyPage:
+    """One page of a paginated REST resource, streamed from the response
+
+    Every read of the body runs in a ``read_timer()`` block when given.
+    """
+
+    def __init__(self, response, key, read_timer=None):
+        self.response = response
+        self.key = key
+        self.read_timer = read_timer or contextlib.nullcontext
+        self.bytes_received = 0
+        next_link = response.links.get('next', {}).get('url', '')
+        match = re.search(r'page_info=([^&>]+)', next_link)
+        self.next_page_info = match.group(1) if match else None
+
+    @property
+    def items(self):
+        """Lazily decoded items of the page"""
+        try:
+            yield from iter_json_array(self._iter_chunks(), self.key)
+        finally:
+            self.response.close()
+
+    def _iter_chunks(self):
+        chunks = self.response.iter_content(STREAM_CHUNK_SIZE)
+        while True:
+            with self.read_timer():
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            self.bytes_received += len(chunk)
+            yield chunk
+
+
+class ShopifyClient:
+    """Thin wrapper around a pooled session bound to one store and API version
+
+    With ``pooled=False``, the client gets a session of its own, to close
+    once done, e.g. for credentials that are only being tried out.
+    """
+
+    def __init__(self, store_url, access_token, api_version,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES,
+                 pooled=True):
+        self.base_url = get_store_base_url(store_url)
+        # Same form as the connector's shop domain, used to label metrics
+        self.shop = self.base_url.split('://', 1)[-1].split('/', 1)[0].lower()
+        self.api_url = f"{self.base_url}/admin/api/{api_version}"
+        self.timeout = (connect_timeout or DEFAULT_CONNECT_TIMEOUT, read_timeout or DEFAULT_READ_TIMEOUT)
+        if pooled:
+            self.session = get_session(self.base_url, access_token, max_retries)
+        else:
+            self.session = _build_session(access_token, max_retries)
+        self.throttle = get_throttle(self.base_url)
+
+    def _url(self, path):
+        if '://' in path:
+            return path
+        return f"{self.api_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, **kwargs):
+        """Send a request, pacing calls to the store and retrying throttled ones"""
+        url = self._url(path)
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            self.throttle.acquire()
+            try:
+                with metrics.API_DURATION.time(shop=self.shop):
+                    response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.RequestException:
+                metrics.API_REQUESTS.inc(shop=self.shop, status='error')
+                raise
+            metrics.API_REQUESTS.inc(shop=self.shop, status=str(response.status_code))
+            self.throttle.update(response)
+            if response.status_code != 429 or attempt == MAX_THROTTLE_RETRIES:
+                return response
+            delay = self.throttle.backoff(response.headers.get('Retry-After'), attempt)
+            _logger.info("Shopify rate limit reached for %s, retrying in %.1fs", self.base_url, delay)
+            response.close()
+        return response
+
+    def get(self, path, params=None, **kwargs):
+        """GET an Admin API resource, given relative to the API root or as a full URL"""
+        return self.request('GET', path, params=params, **kwargs)
+
+    def iter_pages(self, path, key, params=None, page_info=None, limit=250, read_timer=None):
+        """Iterate over the pages of a cursor-paginated REST resource
+
+        Yields a ``ShopifyPage`` per page, starting from the ``page_info``
+        cursor when given. Its items must be consumed before asking for the
+        next page, as the body is streamed from the socket; ``read_timer``
+        is handed to the pages to time those reads.
+        """
+        # Filters are encoded in the cursor, only the page size and the
+        # field projection may accompany it
+        cursor_params = {name: value for name, value in (params or {}).items() if name == 'fields'}
+        cursor_params['limit'] = limit
+        if page_info:
+            params = dict(cursor_params, page_info=page_info)
+        else:
+            params = dict(params or {}, limit=limit)
+        while True:
+            response = self.get(path, params=params, stream=True)
+            if response.status_code != 200:
+                raise ShopifyError(f"{response.status_code} - {response.text}")
+
+            page = ShopifyPage(response, key, read_timer)
+            yield page
+            if not page.next_page_info:
+                return
+            params = dict(cursor_params, page_info=page.next_page_info)
+
+    def graphql(self, query, variables=None):
+        """Run a GraphQL Admin API query and return its data"""
+        response = self.request('POST', 'graphql.json', json={'query': query, 'variables': variables or {}})
+        if response.status_code != 200:
+            raise ShopifyError(f"GraphQL request failed: {response.status_code} - {response.text}")
+        payload = response.json()
+        if payload.get('errors'):
+            raise ShopifyError(f"GraphQL errors: {payload['errors']}")
+        return payload.get('data') or {}
+
+    def iter_download_lines(self, url):
+        """Stream a file served outside the Admin API line by line
+
+        Used for bulk operation results, which are served from signed URLs;
+        the store's access token is deliberately not sent along.
+        """
+        with requests.get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise ShopifyError(f"Download failed: {response.status_code} - {response.text}")
+            yield from response.iter_lines()
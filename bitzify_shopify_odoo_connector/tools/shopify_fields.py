@@ -0,0 +1,76 @@
+"""Order fields read by the connector
+
+Single declaration of the order data the connector maps into Odoo. The
+REST ``fields`` parameter and the GraphQL bulk selection are both built
+from it, so Shopify only sends what the mapping code uses.
+"""
+import hashlib
+import json
+
+ADDRESS_SELECTION = '{ name address1 address2 city zip phone countryCodeV2 provinceCode }'
+
+LINE_ITEMS_SELECTION = '''{
+          edges {
+            node {
+              id
+              name
+              sku
+              quantity
+              originalUnitPriceSet { shopMoney { amount } }
+              product { id }
+              variant { id }
+            }
+          }
+        }'''
+
+SHIPPING_LINES_SELECTION = '''{
+          edges {
+            node {
+              id
+              title
+              originalPriceSet { shopMoney { amount } }
+            }
+          }
+        }'''
+
+# (REST field, GraphQL field, GraphQL sub-selection)
+ORDER_FIELDS = (
+    ('id', 'id', None),
+    ('name', 'name', None),
+    ('email', 'email', None),
+    ('financial_status', 'displayFinancialStatus', None),
+    ('fulfillment_status', 'displayFulfillmentStatus', None),
+    ('created_at', 'createdAt', None),
+    ('updated_at', 'updatedAt', None),
+    ('note', 'note', None),
+    ('customer', 'customer', '{ id firstName lastName phone }'),
+    ('billing_address', 'billingAddress', ADDRESS_SELECTION),
+    ('shipping_address', 'shippingAddress', ADDRESS_SELECTION),
+    ('line_items', 'lineItems', LINE_ITEMS_SELECTION),
+    ('shipping_lines', 'shippingLines', SHIPPING_LINES_SELECTION),
+)
+
+# Nested connections, exported as separate lines by bulk operations
+ORDER_CONNECTIONS = ('line_items', 'shipping_lines')
+
+# Fields whose changes are carried over to already imported orders
+FINGERPRINT_FIELDS = ('financial_status', 'fulfillment_status')
+
+
+def rest_order_fields():
+    """Return the ``fields`` parameter of REST order requests"""
+    return ','.join(rest_field for rest_field, _graphql_field, _selection in ORDER_FIELDS)
+
+
+def graphql_order_selection():
+    """Return the GraphQL selection of an order node"""
+    return '\n        '.join(
+        f'{graphql_field} {selection}' if selection else graphql_field
+        for _rest_field, graphql_field, selection in ORDER_FIELDS
+    )
+
+
+def order_fingerprint(order_data):
+    """Return a hash of the order fields carried over to imported orders"""
+    values = [order_data.get(field) for field in FINGERPRINT_FIELDS]
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,68 @@
+"""Statistics collected while a sync run imports orders"""
+import time
+from contextlib import contextmanager
+
+# Stages of the import pipeline whose time is measured
+STAGES = ('http', 'parse', 'partner', 'product', 'create', 'confirm')
+
+COUNTERS = ('pages', 'bytes', 'created', 'updated', 'skipped', 'failed')
+
+
+class SyncStats:
+    """Counters and per-stage timings of one sync run
+
+    Passed explicitly along the import methods, which feed it as they go.
+    Timings are cumulated wall-clock seconds, each second counted in the
+    innermost stage being timed.
+    """
+
+    def __init__(self):
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        # [stage, start] of the timers in progress, innermost last
+        self._running = []
+
+    def add(self, counter, value=1):
+        self.counts[counter] += value
+
+    @contextmanager
+    def timer(self, stage):
+        """Add the time spent in the block to ``stage``
+
+        A timer started inside the block pauses this one, e.g. body reads
+        timed under ``http`` while parsing are not counted as ``parse``.
+        """
+        now = time.perf_counter()
+        if self._running:
+            self._pause(now)
+        self._running.append([stage, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._pause(now)
+            self._running.pop()
+            if self._running:
+                # Resume the enclosing timer
+                self._running[-1][1] = now
+
+    def _pause(self, now):
+        stage, start = self._running[-1]
+        self.timings[stage] += now - start
+
+    def iter_timed(self, stage, iterable):
+        """Iterate, adding the time spent producing each item to ``stage``"""
+        iterator = iter(iterable)
+        while True:
+            with self.timer(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def iter_counted(self, chunks):
+        """Iterate over received chunks, counting their bytes"""
+        for chunk in chunks:
+            self.counts['bytes'] += len(chunk)
+            yield chunk
@@ -2,6 +2,8 @@ from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 import requests
 
+from ..tools.shopify_client import ShopifyClient
+
 
 class ShopifyConfigWizard(models.TransientModel):
     _name = 'bitzify.shopify.config.wizard'
@@ -87,13 +89,12 @@ class ShopifyConfigWizard(models.TransientModel):
                     store_url = f"{store_url}.myshopify.com"
                     self.shopify_store_url = store_url
                     
-            headers = {
-                'X-Shopify-Access-Token': self.api_access_token,
-                'Content-Type': 'application/json'
-            }
-            
-            url = f"https://{store_url}/admin/api/2023-10/shop.json"
-            response = requests.get(url, headers=headers, timeout=30)
+            # Every token typed would stay in the pool, use a throwaway session
+            client = ShopifyClient(store_url, self.api_access_token, '2023-10', pooled=False)
+            try:
+                response = client.get('shop.json')
+            finally:
+                client.session.close()
             
             if response.status_code == 200:
                 shop_data = response.json().get('shop', {})